@@ -1,19 +1,98 @@
 import os
+import sys
 import io
+import json
+import shutil
+import re
 import uuid
-import base64
+import fcntl
+import hashlib
 import tempfile
+import gzip
 import zipfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 
-from flask import Flask, request, send_file, render_template_string, jsonify
-import fitz  # PyMuPDF
-from PIL import Image
+from flask import Flask, Request, Response, g, has_request_context, request, send_file, jsonify
 from werkzeug.utils import secure_filename
 
+# The rendering core sits next to this file and is shared with pdf2img.py.
+# It pulls in PyMuPDF and Pillow, so it is only imported once a route needs
+# it (see _renderer); the process pool's multiprocessing is deferred likewise.
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
 app = Flask(__name__)
 app.config["MAX_CONTENT_LENGTH"] = 16 * 1024 * 1024  # 16 MB
-
-converted_sessions = {}
+# Uploads up to this size are parsed straight from memory; larger ones are
+# spooled to a temp file that PyMuPDF reads from disk.
+app.config["UPLOAD_SPOOL_BYTES"] = int(os.environ.get("UPLOAD_SPOOL_BYTES", 8 * 1024 * 1024))
+# Number of processes pages are rendered on; 1 renders in the request thread.
+app.config["RENDER_WORKERS"] = int(os.environ.get("RENDER_WORKERS", os.cpu_count() or 1))
+# Width in pixels of the preview thumbnails shown in the results grid.
+app.config["THUMBNAIL_WIDTH"] = int(os.environ.get("THUMBNAIL_WIDTH", 300))
+# PNG pages whose full-frame pixmap would exceed BAND_THRESHOLD_BYTES are
+# rendered BAND_HEIGHT rows at a time and encoded incrementally instead.
+app.config["BAND_THRESHOLD_BYTES"] = int(os.environ.get("BAND_THRESHOLD_BYTES", 64 * 1024 * 1024))
+app.config["BAND_HEIGHT"]          = int(os.environ.get("BAND_HEIGHT", 512))
+# Converted pages are kept in memory up to this many bytes, least recently
+# used sessions first out, and dropped after SESSION_TTL idle seconds.
+app.config["SESSION_MAX_BYTES"] = int(os.environ.get("SESSION_MAX_BYTES", 512 * 1024 * 1024))
+app.config["SESSION_TTL"]       = int(os.environ.get("SESSION_TTL", 60 * 60))
+# "memory" keeps pages in this process; "disk" writes them under SESSION_DIR
+# so every worker process on the machine can serve every session.
+app.config["SESSION_STORE"] = os.environ.get("SESSION_STORE", "memory")
+app.config["SESSION_DIR"]   = os.environ.get(
+    "SESSION_DIR", os.path.join(tempfile.gettempdir(), "pdf2img-sessions"))
+# Rendered pages are cached by (PDF SHA-256, page, DPI, format) up to this
+# many bytes so re-uploads of the same document skip rendering; 0 disables.
+app.config["RENDER_CACHE_BYTES"] = int(os.environ.get("RENDER_CACHE_BYTES", 256 * 1024 * 1024))
+# Parsed PDFs kept open per process, bounded by their file sizes, so later
+# renders of the same document skip parsing it again (0 disables).
+app.config["DOCUMENT_CACHE_BYTES"] = int(os.environ.get("DOCUMENT_CACHE_BYTES", 128 * 1024 * 1024))
+# Background conversions started with POST /jobs: how many run at once and
+# how many more may wait before new jobs are turned away with a 429.
+app.config["JOB_CONCURRENCY"] = int(os.environ.get("JOB_CONCURRENCY", 2))
+app.config["JOB_QUEUE_DEPTH"] = int(os.environ.get("JOB_QUEUE_DEPTH", 16))
+# Chunked uploads (POST /uploads) are assembled under UPLOAD_DIR, may total
+# UPLOAD_MAX_BYTES, and are removed SESSION_TTL seconds after their last chunk.
+app.config["UPLOAD_DIR"]       = os.environ.get(
+    "UPLOAD_DIR", os.path.join(tempfile.gettempdir(), "pdf2img-uploads"))
+app.config["UPLOAD_MAX_BYTES"] = int(os.environ.get("UPLOAD_MAX_BYTES", 512 * 1024 * 1024))
+# Conversions are admitted while their estimated peak pixmap memory fits
+# ADMISSION_BUDGET_BYTES (0 disables); others wait in a queue of up to
+# ADMISSION_QUEUE requests for ADMISSION_WAIT seconds, then get a 429.
+app.config["ADMISSION_BUDGET_BYTES"] = int(os.environ.get("ADMISSION_BUDGET_BYTES", 1024 * 1024 * 1024))
+app.config["ADMISSION_QUEUE"]        = int(os.environ.get("ADMISSION_QUEUE", 32))
+app.config["ADMISSION_WAIT"]         = float(os.environ.get("ADMISSION_WAIT", 10))
+# Conversion requests allowed per client per minute, in bursts of up to
+# RATE_LIMIT_BURST; 0 disables the limit.
+app.config["RATE_LIMIT_PER_MINUTE"] = float(os.environ.get("RATE_LIMIT_PER_MINUTE", 30))
+app.config["RATE_LIMIT_BURST"]      = int(os.environ.get("RATE_LIMIT_BURST", 10))
+# Adds a Server-Timing header with per-stage durations to each response.
+app.config["SERVER_TIMING"] = os.environ.get("SERVER_TIMING", "") not in ("", "0", "false")
+
+_render_pool      = None
+_render_pool_lock = threading.Lock()
+
+
+class UploadRequest(Request):
+    """Request that buffers file uploads in memory up to UPLOAD_SPOOL_BYTES.
+
+    Werkzeug would otherwise spool anything over 500 KB to an anonymous temp
+    file.  Bigger uploads go to a named temp file so ``_load_upload`` can take
+    it over instead of copying it.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if total_content_length is not None and total_content_length <= app.config["UPLOAD_SPOOL_BYTES"]:
+            return io.BytesIO()
+        return tempfile.NamedTemporaryFile(prefix="pdf2img-spool-")
+
+
+app.request_class = UploadRequest
 
 HTML = """<!DOCTYPE html>
 <html lang="en">
@@ -152,6 +231,7 @@ HTML = """<!DOCTYPE html>
       gap: 12px;
       margin-bottom: 20px;
     }
+    .opt-block.wide { grid-column: 1 / -1; }
     .opt-block label {
       font-size: 0.68rem; font-weight: 700;
       letter-spacing: 1.2px; text-transform: uppercase;
@@ -249,7 +329,7 @@ HTML = """<!DOCTYPE html>
       background: var(--ink); color: #fff;
       border: none; border-radius: 9px;
       font-family: var(--sans); font-size: 0.82rem; font-weight: 700;
-      cursor: pointer;
+      cursor: pointer; text-decoration: none;
       transition: opacity 0.15s, transform 0.12s;
       white-space: nowrap;
     }
@@ -356,7 +436,7 @@ HTML = """<!DOCTYPE html>
       <input type="file" id="pdfFile" accept=".pdf" />
       <span class="drop-icon">📄</span>
       <p class="drop-title">Drop your PDF here</p>
-      <p class="drop-sub">or click to browse · max 16 MB</p>
+      <p class="drop-sub">or click to browse · up to 512 MB</p>
     </div>
 
     <!-- File chosen indicator -->
@@ -374,12 +454,33 @@ HTML = """<!DOCTYPE html>
         <select class="opt-select" id="format">
           <option value="PNG">PNG — lossless</option>
           <option value="JPEG">JPEG — smaller</option>
+          <option value="WEBP">WebP — smallest</option>
+          <option value="WEBP-LOSSLESS">WebP — lossless</option>
+          <option value="TIFF">TIFF — one multi-page file</option>
         </select>
       </div>
       <div class="opt-block">
         <label for="dpi">Resolution (DPI)</label>
         <input type="number" class="opt-input" id="dpi" value="200" min="72" max="300" />
       </div>
+      <div class="opt-block">
+        <label for="quality">Quality</label>
+        <input type="number" class="opt-input" id="quality" placeholder="Default" min="1" max="100" />
+      </div>
+      <div class="opt-block">
+        <label for="colorspace">Colour</label>
+        <select class="opt-select" id="colorspace">
+          <option value="rgb">Colour</option>
+          <option value="auto">Auto — smallest that fits</option>
+          <option value="gray">Grayscale</option>
+          <option value="bilevel">Black &amp; white</option>
+          <option value="alpha">Transparent background</option>
+        </select>
+      </div>
+      <div class="opt-block wide">
+        <label for="pages">Pages</label>
+        <input type="text" class="opt-input" id="pages" placeholder="All — or e.g. 1-3, 7, 10-" />
+      </div>
     </div>
 
     <button class="btn-convert" id="convertBtn" onclick="doConvert()" disabled>
@@ -394,9 +495,9 @@ HTML = """<!DOCTYPE html>
       <span id="progressPct"></span>
     </div>
     <div class="progress-track">
-      <div class="progress-fill" id="progressFill" style="width:40%"></div>
+      <div class="progress-fill" id="progressFill" style="width:0"></div>
     </div>
-    <p class="progress-sub">Processing in your browser — this may take a moment for large files</p>
+    <p class="progress-sub">Pages appear below as soon as they are rendered</p>
   </div>
 
   <!-- Error -->
@@ -411,9 +512,9 @@ HTML = """<!DOCTYPE html>
         <span class="results-title">Converted pages</span>
         <span class="results-count" id="pageCount">—</span>
       </div>
-      <button class="btn-dl-all" onclick="downloadAll()">
+      <a class="btn-dl-all" id="downloadAllBtn" download>
         ↓ Download all as ZIP
-      </button>
+      </a>
     </div>
     <div class="pages-grid" id="pagesGrid"></div>
   </div>
@@ -444,6 +545,7 @@ HTML = """<!DOCTYPE html>
   const progressCard = document.getElementById('progressCard');
   const progressLabel= document.getElementById('progressLabel');
   const progressFill = document.getElementById('progressFill');
+  const progressPct  = document.getElementById('progressPct');
   const errorCard  = document.getElementById('errorCard');
   const errorMsg   = document.getElementById('errorMsg');
   const resultsCard= document.getElementById('resultsCard');
@@ -492,47 +594,70 @@ HTML = """<!DOCTYPE html>
   async function doConvert() {
     if (!selectedFile) return;
 
-    currentFmt = document.getElementById('format').value;
-    const dpi  = document.getElementById('dpi').value;
+    const choice  = document.getElementById('format').value;
+    currentFmt    = choice.split('-')[0];
+    const dpi     = document.getElementById('dpi').value;
+    const quality = document.getElementById('quality').value;
+    const colorspace = document.getElementById('colorspace').value;
+    const pages = document.getElementById('pages').value;
 
     convertBtn.disabled = true;
     progressCard.classList.add('show');
-    progressLabel.textContent = 'Uploading and converting…';
-    progressFill.style.width  = '20%';
+    progressLabel.textContent = 'Uploading…';
+    progressPct.textContent   = '';
+    progressFill.style.width  = '0%';
     errorCard.classList.remove('show');
     resultsCard.classList.remove('show');
     resetRow.style.display = 'none';
 
-    const formData = new FormData();
-    formData.append('pdf', selectedFile);
-    formData.append('format', currentFmt);
-    formData.append('dpi', dpi);
-
     try {
-      progressFill.style.width = '45%';
-      progressLabel.textContent = 'Processing pages…';
+      const formData = new FormData();
+      if (selectedFile.size > CHUNK_BYTES) {
+        formData.append('upload_id', await uploadInChunks(selectedFile));
+        progressLabel.textContent = 'Opening document…';
+        progressPct.textContent   = '';
+        progressFill.style.width  = '0%';
+      } else {
+        formData.append('pdf', selectedFile);
+      }
+      formData.append('format', currentFmt);
+      formData.append('lossless', choice.endsWith('-LOSSLESS') ? '1' : '');
+      formData.append('quality', quality);
+      formData.append('colorspace', colorspace);
+      formData.append('dpi', dpi);
+      formData.append('pages', pages);
 
-      const res  = await fetch('/convert', { method: 'POST', body: formData });
-      progressFill.style.width = '85%';
+      const res = await fetch('/convert/stream', { method: 'POST', body: formData });
 
       if (!res.ok) {
         const txt = await res.text();
         throw new Error(txt || 'Conversion failed');
       }
 
-      const data = await res.json();
-      if (data.error) throw new Error(data.error);
-
-      sessionId  = data.session_id;
-      pageCount  = data.pages.length;
+      // One JSON event per line; pages are shown as soon as they arrive.
+      const reader  = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffered  = '';
+      let finished  = false;
+
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffered += decoder.decode(value, { stream: true });
+        const lines = buffered.split('\\n');
+        buffered = lines.pop();
+        for (const line of lines) {
+          if (line && handleEvent(JSON.parse(line))) finished = true;
+        }
+      }
+      if (!finished) throw new Error('Conversion was interrupted');
 
       progressFill.style.width = '100%';
       progressLabel.textContent = 'Done!';
 
-      setTimeout(() => {
-        progressCard.classList.remove('show');
-        showResults(data.pages);
-      }, 500);
+      setTimeout(() => progressCard.classList.remove('show'), 500);
+      resetRow.style.display = 'block';
+      convertBtn.disabled = false;
 
     } catch(err) {
       progressCard.classList.remove('show');
@@ -542,60 +667,105 @@ HTML = """<!DOCTYPE html>
     }
   }
 
-  // ── Show results ─────────────────────────────────────────────────────────
-  function showResults(pages) {
-    document.getElementById('pageCount').textContent = pages.length + ' page' + (pages.length !== 1 ? 's' : '');
-    pagesGrid.innerHTML = '';
+  // Files over one chunk go up as numbered, checksummed chunks.  A failed
+  // chunk is retried from wherever the server says the upload stands.
+  const CHUNK_BYTES = 8 * 1024 * 1024;
 
-    pages.forEach((b64, i) => {
-      const card = document.createElement('div');
-      card.className = 'page-card';
-
-      const mime = currentFmt === 'JPEG' ? 'image/jpeg' : 'image/png';
-      const src  = `data:${mime};base64,${b64}`;
-
-      card.innerHTML = `
-        <div class="page-thumb-wrap">
-          <img class="page-thumb" src="${src}" alt="Page ${i+1}" loading="lazy" />
-          <span class="page-num-badge">p.${i+1}</span>
-        </div>
-        <div class="page-footer">
-          <span class="page-label">Page ${i+1}</span>
-          <a class="btn-dl-page" href="#" onclick="downloadPage(${i}, event)">↓ Save</a>
-        </div>
-      `;
-      pagesGrid.appendChild(card);
+  async function uploadInChunks(file) {
+    const init = await fetch('/uploads', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ filename: file.name, size: file.size })
     });
+    const created = await init.json();
+    if (!init.ok) throw new Error(created.error || 'Upload failed');
+
+    const uploadId = created.upload_id;
+    const total    = Math.ceil(file.size / CHUNK_BYTES);
+    let next = 0, attempts = 0;
+
+    while (next < total) {
+      const chunk   = file.slice(next * CHUNK_BYTES, (next + 1) * CHUNK_BYTES);
+      const headers = crypto.subtle ? { 'X-Chunk-SHA256': await sha256Hex(chunk) } : {};
+      let state;
+      try {
+        const res = await fetch(`/uploads/${uploadId}/${next}`, { method: 'PUT', headers, body: chunk });
+        state = await res.json();
+        if (!res.ok) throw new Error(state.error || 'Upload failed');
+        attempts = 0;
+      } catch (err) {
+        if (++attempts > 3) throw err;
+        state = await (await fetch(`/uploads/${uploadId}`)).json();
+      }
+      next = state.next_chunk;
+      progressFill.style.width = `${Math.round(next / total * 100)}%`;
+      progressPct.textContent  = `${Math.round(next / total * 100)}%`;
+    }
 
-    resultsCard.classList.add('show');
-    resetRow.style.display = 'block';
-    convertBtn.disabled = false;
+    const fin = await fetch(`/uploads/${uploadId}/finalize`, { method: 'POST' });
+    if (!fin.ok) throw new Error((await fin.json()).error || 'Upload failed');
+    return uploadId;
+  }
 
-    setTimeout(() => resultsCard.scrollIntoView({ behavior: 'smooth', block: 'start' }), 80);
+  async function sha256Hex(blob) {
+    const hash = await crypto.subtle.digest('SHA-256', await blob.arrayBuffer());
+    return Array.from(new Uint8Array(hash), b => b.toString(16).padStart(2, '0')).join('');
   }
 
-  // ── Downloads ────────────────────────────────────────────────────────────
-  async function downloadPage(idx, e) {
-    e.preventDefault();
-    const res  = await fetch(`/download/${sessionId}/${idx}`);
-    const blob = await res.blob();
-    const url  = URL.createObjectURL(blob);
-    const a    = Object.assign(document.createElement('a'), {
-      href: url, download: `page_${idx+1}.${currentFmt.toLowerCase()}`
-    });
-    document.body.appendChild(a); a.click(); document.body.removeChild(a);
-    URL.revokeObjectURL(url);
+  // Returns true once the stream reports that every page is done.
+  function handleEvent(evt) {
+    if (evt.event === 'error') throw new Error(evt.error);
+
+    if (evt.event === 'start') {
+      sessionId = evt.session_id;
+      pageCount = evt.page_count;
+      showResults(pageCount);
+      progressLabel.textContent = 'Rendering pages…';
+      progressPct.textContent   = `0 / ${pageCount}`;
+    }
+
+    if (evt.event === 'page') {
+      addPageCard(evt);
+      const done = pagesGrid.children.length;
+      progressFill.style.width = `${Math.round(done / pageCount * 100)}%`;
+      progressPct.textContent  = `${done} / ${pageCount}`;
+      if (done === 1) {
+        setTimeout(() => resultsCard.scrollIntoView({ behavior: 'smooth', block: 'start' }), 80);
+      }
+    }
+
+    return evt.event === 'done';
   }
 
-  async function downloadAll() {
-    const res  = await fetch(`/download-all/${sessionId}`);
-    const blob = await res.blob();
-    const url  = URL.createObjectURL(blob);
-    const a    = Object.assign(document.createElement('a'), {
-      href: url, download: 'pages.zip'
-    });
-    document.body.appendChild(a); a.click(); document.body.removeChild(a);
-    URL.revokeObjectURL(url);
+  // ── Show results ─────────────────────────────────────────────────────────
+  function showResults(total) {
+    document.getElementById('pageCount').textContent = total + ' page' + (total !== 1 ? 's' : '');
+    const downloadAllBtn = document.getElementById('downloadAllBtn');
+    // A plain link: the browser streams the archive to disk as it arrives.
+    downloadAllBtn.href        = `/download-all/${sessionId}`;
+    downloadAllBtn.textContent =
+      currentFmt === 'TIFF' ? '↓ Download as multi-page TIFF' : '↓ Download all as ZIP';
+    pagesGrid.innerHTML = '';
+    resultsCard.classList.add('show');
+  }
+
+  function addPageCard(page) {
+    const i    = page.index;
+    const n    = page.page;
+    const card = document.createElement('div');
+    card.className = 'page-card';
+
+    card.innerHTML = `
+      <div class="page-thumb-wrap">
+        <img class="page-thumb" src="${page.thumbnail_url}" alt="Page ${n}" loading="lazy" />
+        <span class="page-num-badge">p.${n}</span>
+      </div>
+      <div class="page-footer">
+        <span class="page-label">Page ${n}</span>
+        <a class="btn-dl-page" href="${page.download_url}" download>↓ Save</a>
+      </div>
+    `;
+    pagesGrid.appendChild(card);
   }
 
   function resetAll() {
@@ -608,91 +778,2019 @@ HTML = """<!DOCTYPE html>
 """
 
 
+# ── Metrics ──────────────────────────────────────────────────────────────────
+
+class Metrics:
+    """Process-local counters, gauges and histograms in Prometheus text format."""
+
+    BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+    def __init__(self):
+        self._lock   = threading.Lock()
+        self._meta   = {}  # name -> (type, help)
+        self._values = {}  # (name, labels) -> number, or [bucket counts..., sum, count]
+
+    def describe(self, name, kind, text):
+        self._meta[name] = (kind, text)
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            hist = self._values.setdefault(key, [0] * (len(self.BUCKETS) + 2))
+            for k, bound in enumerate(self.BUCKETS):
+                if value <= bound:
+                    hist[k] += 1
+            hist[-2] += value
+            hist[-1] += 1
+
+    def render(self, gauges=()):
+        """Prometheus exposition text; ``gauges`` adds ``(name, value, labels)`` read at scrape time."""
+        with self._lock:
+            values = sorted(self._values.items())
+        lines, described = [], set()
+
+        def header(name):
+            if name not in described and name in self._meta:
+                kind, text = self._meta[name]
+                lines.append(f"# HELP {name} {text}")
+                lines.append(f"# TYPE {name} {kind}")
+                described.add(name)
+
+        for (name, labels), value in values:
+            header(name)
+            if isinstance(value, list):
+                # observe() already counts a value into every bucket it fits.
+                for bound, count in zip(self.BUCKETS, value):
+                    lines.append(f"{name}_bucket{_labels(labels, le=bound)} {count}")
+                lines.append(f"{name}_bucket{_labels(labels, le='+Inf')} {value[-1]}")
+                lines.append(f"{name}_sum{_labels(labels)} {value[-2]}")
+                lines.append(f"{name}_count{_labels(labels)} {value[-1]}")
+            else:
+                lines.append(f"{name}{_labels(labels)} {value}")
+        for name, value, labels in gauges:
+            header(name)
+            lines.append(f"{name}{_labels(tuple(sorted(labels.items())))} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+metrics = Metrics()
+metrics.describe("pdf2img_stage_seconds", "histogram", "Time spent in each stage of conversion and download.")
+metrics.describe("pdf2img_request_seconds", "histogram", "HTTP request handling time by endpoint.")
+metrics.describe("pdf2img_pages_rendered_total", "counter", "Pages rasterised and encoded (render cache misses).")
+metrics.describe("pdf2img_conversions_total", "counter", "Finished conversions by outcome.")
+metrics.describe("pdf2img_active_conversions", "gauge", "Conversions currently rendering in this process.")
+metrics.describe("pdf2img_sessions", "gauge", "Sessions held by the session store.")
+metrics.describe("pdf2img_session_bytes", "gauge", "Bytes of pages held by the session store.")
+metrics.describe("pdf2img_session_events_total", "counter", "Session store lookups and removals by kind.")
+metrics.describe("pdf2img_render_cache_bytes", "gauge", "Bytes held by the render cache.")
+metrics.describe("pdf2img_render_cache_events_total", "counter", "Render cache lookups and evictions by kind.")
+metrics.describe("pdf2img_document_cache_bytes", "gauge", "Bytes of PDFs held open by the document cache.")
+metrics.describe("pdf2img_document_cache_events_total", "counter", "Document cache lookups and evictions by kind.")
+metrics.describe("pdf2img_jobs_pending", "gauge", "Background jobs queued or running.")
+metrics.describe("pdf2img_admitted_bytes", "gauge", "Estimated pixmap memory of admitted conversions.")
+metrics.describe("pdf2img_admission_waiting", "gauge", "Conversions queued for admission.")
+metrics.describe("pdf2img_rejected_total", "counter", "Conversion requests refused with a 429, by reason.")
+
+_active_conversions = 0
+_active_lock        = threading.Lock()
+
+
+def _record_stage(stage, seconds):
+    """Count ``seconds`` towards ``stage`` in the metrics and, inside a
+    request, towards that response's Server-Timing header."""
+    metrics.observe("pdf2img_stage_seconds", seconds, stage=stage)
+    if has_request_context():
+        timings = g.setdefault("stage_times", {})
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def _timed(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record_stage(stage, time.perf_counter() - start)
+
+
+@contextmanager
+def _active_conversion():
+    global _active_conversions
+    with _active_lock:
+        _active_conversions += 1
+    status = "failed"
+    try:
+        yield
+        status = "ok"
+    finally:
+        with _active_lock:
+            _active_conversions -= 1
+        metrics.inc("pdf2img_conversions_total", status=status)
+
+
+# ── Session store ────────────────────────────────────────────────────────────
+
+# Both stores expose create(), add_page(), set_page(), set_source(),
+# get_source(), get() and stats().  get() returns a list of page dicts with
+# "format", "width", "height" and "etag", and the image bytes either inline
+# ("data", "thumb") or as files ("data_path", "thumb_path"); _page_source()
+# turns either into something send_file accepts.  Lazy sessions start out
+# with placeholder pages that carry a "render" spec instead of image bytes,
+# plus the source PDF, and set_page() fills the slots in as pages render.
+
+
+def _page_bytes(page):
+    return len(page.get("data", b"")) + len(page.get("thumb", b""))
+
+
+def _link_file(src, dst):
+    """Hard-link ``src`` to ``dst``, copying instead across filesystems."""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+class MemorySessionStore:
+    """Converted pages per session in process memory, bounded by a byte budget.
+
+    Sessions are evicted least recently used first once the pages held
+    (and any source PDF kept for lazy rendering) exceed ``max_bytes``, and
+    expire after ``ttl`` seconds without being read or written.  The session
+    currently being written is never evicted to make room for itself, so a
+    single oversized document still completes.
+    """
+
+    def __init__(self, max_bytes, ttl):
+        self.max_bytes = max_bytes
+        self.ttl       = ttl
+        self._sessions = OrderedDict()  # id -> {"pages", "bytes", "touched", "source", "job"}
+        self._lock     = threading.Lock()
+        self._bytes    = 0
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def create(self, session_id):
+        with self._lock:
+            self._expire(time.monotonic())
+            self._sessions[session_id] = {"pages": [], "bytes": 0, "touched": time.monotonic()}
+
+    def add_page(self, session_id, page):
+        size = _page_bytes(page)
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return
+            entry["pages"].append(page)
+            self._grow(session_id, entry, size)
+
+    def set_page(self, session_id, index, page):
+        """Replace the page in slot ``index``, e.g. a rendered placeholder."""
+        size = _page_bytes(page)
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return
+            size -= _page_bytes(entry["pages"][index])
+            entry["pages"][index] = page
+            self._grow(session_id, entry, size)
+
+    def set_source(self, session_id, source):
+        """Keep the session's PDF for lazy rendering.
+
+        Bytes are held as they are; a path is hard-linked to a file the store
+        owns and removes with the session.
+        """
+        if isinstance(source, str):
+            fd, path = tempfile.mkstemp(prefix="pdf2img-source-", suffix=".pdf")
+            os.close(fd)
+            os.remove(path)
+            _link_file(source, path)
+            source, size = path, os.path.getsize(path)
+        else:
+            size = len(source)
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is not None:
+                entry["source"] = source
+                self._grow(session_id, entry, size)
+                return
+        if isinstance(source, str):
+            os.remove(source)
+
+    def get_source(self, session_id):
+        """Return the PDF kept by set_source(), or None."""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            return entry and entry.get("source")
+
+    def set_job(self, session_id, job):
+        """Keep the status record of the background job filling the session."""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is not None:
+                entry["job"] = dict(job)
+
+    def get_job(self, session_id):
+        """Return the record kept by set_job(), or None."""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            return dict(entry["job"]) if entry and "job" in entry else None
+
+    def get(self, session_id):
+        """Return the session's page list, or None if unknown or evicted."""
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            entry["touched"] = now
+            self._sessions.move_to_end(session_id)
+            return entry["pages"]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "sessions":    len(self._sessions),
+                "bytes":       self._bytes,
+                "max_bytes":   self.max_bytes,
+                "hits":        self.hits,
+                "misses":      self.misses,
+                "evictions":   self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def _grow(self, session_id, entry, size):
+        entry["bytes"]  += size
+        entry["touched"] = time.monotonic()
+        self._bytes     += size
+        self._sessions.move_to_end(session_id)
+        self._evict(keep=session_id)
+
+    def _drop(self, session_id):
+        entry = self._sessions.pop(session_id)
+        self._bytes -= entry["bytes"]
+        if isinstance(entry.get("source"), str):
+            try:
+                os.remove(entry["source"])
+            except FileNotFoundError:
+                pass
+
+    def _expire(self, now):
+        # Oldest-touched sessions sit at the front, so stop at the first live one.
+        while self._sessions:
+            session_id, entry = next(iter(self._sessions.items()))
+            if now - entry["touched"] < self.ttl:
+                break
+            self._drop(session_id)
+            self.expirations += 1
+
+    def _evict(self, keep):
+        while self._bytes > self.max_bytes:
+            session_id = next(iter(self._sessions))
+            if session_id == keep:
+                break
+            self._drop(session_id)
+            self.evictions += 1
+
+
+class DiskSessionStore:
+    """Converted pages per session as files under ``root``.
+
+    Each session is a directory of page files plus a ``pages.jsonl`` manifest
+    that gets one line per page once its files are fully written, so any
+    process sharing the directory sees only complete pages.  set_page()
+    appends a line naming the slot it replaces, a lazy session's source
+    PDF sits alongside as ``source.pdf``, and a background job's status as
+    ``job.json``.  The directory's
+    mtime records last use; sweeps remove sessions idle for ``ttl`` seconds
+    and then the least recently used ones until the total fits ``max_bytes``.
+    The session and byte totals in stats() are counted by the last sweep,
+    plus the sessions this process created since; hit and miss counters are
+    per process.
+    """
+
+    SWEEP_INTERVAL = 10  # seconds between directory scans on the write path
+
+    _VALID_ID = re.compile(r"^[0-9a-f-]{36}$")
+
+    def __init__(self, root, max_bytes, ttl):
+        self.root      = root
+        self.max_bytes = max_bytes
+        self.ttl       = ttl
+        self._lock     = threading.Lock()
+        self._swept    = 0.0
+        self._sessions = self._bytes = 0
+        self.hits = self.misses = self.evictions = self.expirations = 0
+        os.makedirs(root, exist_ok=True)
+
+    def _dir(self, session_id):
+        if not self._VALID_ID.match(session_id):
+            return None
+        return os.path.join(self.root, session_id)
+
+    def create(self, session_id):
+        os.makedirs(self._dir(session_id))
+        with self._lock:
+            self._sessions += 1
+        self._maybe_sweep(keep=session_id)
+
+    def add_page(self, session_id, page):
+        self._append(session_id, page)
+
+    def set_page(self, session_id, index, page):
+        """Replace the page in slot ``index``, e.g. a rendered placeholder."""
+        self._append(session_id, dict(page, slot=index))
+
+    def set_source(self, session_id, source):
+        """Keep the session's PDF (bytes or a path) for lazy rendering."""
+        path = self._dir(session_id)
+        if not os.path.isdir(path):
+            return
+        if isinstance(source, str):
+            _link_file(source, os.path.join(path, "source.pdf"))
+        else:
+            self._write(path, "source.pdf", source)
+        self._maybe_sweep(keep=session_id)
+
+    def get_source(self, session_id):
+        """Return the path of the PDF kept by set_source(), or None."""
+        path = self._dir(session_id)
+        source = path and os.path.join(path, "source.pdf")
+        return source if source and os.path.exists(source) else None
+
+    def set_job(self, session_id, job):
+        """Keep the status record of the background job filling the session."""
+        path = self._dir(session_id)
+        if path and os.path.isdir(path):
+            self._write(path, "job.json", json.dumps(job).encode())
+
+    def get_job(self, session_id):
+        """Return the record kept by set_job(), or None if unknown or expired."""
+        path = self._dir(session_id)
+        try:
+            if path is None or time.time() - os.stat(path).st_mtime >= self.ttl:
+                return None
+            with open(os.path.join(path, "job.json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _append(self, session_id, page):
+        path = self._dir(session_id)
+        if not os.path.isdir(path):
+            return
+        manifest = os.path.join(path, "pages.jsonl")
+        with open(manifest, "a+") as f:
+            # File names come from the line count, so concurrent writers --
+            # parallel lazy renders, or other processes -- take turns.
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            name  = f"{sum(1 for _ in f):05d}"
+            entry = {k: v for k, v in page.items() if k not in ("data", "thumb")}
+            if "data" in page:
+                entry.update(
+                    data_path=self._write(path, f"{name}.{page['format'].lower()}", page["data"]),
+                    thumb_path=self._write(path, f"{name}.thumb.jpg", page["thumb"]),
+                )
+            f.write(json.dumps(entry) + "\n")
+        with self._lock:
+            self._bytes += _page_bytes(page)
+        self._maybe_sweep(keep=session_id)
+
+    def get(self, session_id):
+        """Return the session's page list, or None if unknown or evicted."""
+        path = self._dir(session_id)
+        try:
+            if path is None or time.time() - os.stat(path).st_mtime >= self.ttl:
+                raise FileNotFoundError(session_id)
+            os.utime(path)
+            pages = []
+            if os.path.exists(os.path.join(path, "pages.jsonl")):
+                with open(os.path.join(path, "pages.jsonl")) as f:
+                    for line in f:
+                        entry = json.loads(line)
+                        if "slot" in entry:
+                            pages[entry.pop("slot")] = entry
+                        else:
+                            pages.append(entry)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return pages
+
+    def stats(self):
+        self._maybe_sweep()
+        with self._lock:
+            return {
+                "sessions":    self._sessions,
+                "bytes":       self._bytes,
+                "max_bytes":   self.max_bytes,
+                "hits":        self.hits,
+                "misses":      self.misses,
+                "evictions":   self.evictions,
+                "expirations": self.expirations,
+            }
+
+    @staticmethod
+    def _write(path, name, data):
+        # Write-then-rename so readers in other processes never see a torn file.
+        final = os.path.join(path, name)
+        with tempfile.NamedTemporaryFile(dir=path, delete=False) as f:
+            f.write(data)
+        os.replace(f.name, final)
+        return final
+
+    def _maybe_sweep(self, keep=None):
+        with self._lock:
+            now = time.time()
+            if now - self._swept < self.SWEEP_INTERVAL:
+                return
+            self._swept = now
+
+        sessions = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            try:
+                size  = sum(e.stat().st_size for e in os.scandir(path))
+                mtime = os.stat(path).st_mtime
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+            sessions.append((mtime, size, name, path))
+
+        expired, evicted = 0, 0
+        total = sum(size for _, size, _, _ in sessions)
+        live  = []
+        for mtime, size, name, path in sorted(sessions):
+            if now - mtime >= self.ttl and name != keep:
+                shutil.rmtree(path, ignore_errors=True)
+                total   -= size
+                expired += 1
+            else:
+                live.append((size, name, path))
+        for size, name, path in live:
+            if total <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            total   -= size
+            evicted += 1
+
+        with self._lock:
+            self._sessions     = len(live) - evicted
+            self._bytes        = total
+            self.expirations  += expired
+            self.evictions    += evicted
+
+
+def _make_session_store():
+    kind = app.config["SESSION_STORE"]
+    if kind == "memory":
+        return MemorySessionStore(app.config["SESSION_MAX_BYTES"], app.config["SESSION_TTL"])
+    if kind == "disk":
+        return DiskSessionStore(app.config["SESSION_DIR"],
+                                app.config["SESSION_MAX_BYTES"], app.config["SESSION_TTL"])
+    raise ValueError(f"Unknown SESSION_STORE: {kind!r}")
+
+
+def _page_source(page, key="data"):
+    """What to hand send_file for a stored page: its file path or an in-memory buffer."""
+    return page.get(f"{key}_path") or io.BytesIO(page[key])
+
+
+converted_sessions = _make_session_store()
+
+
+# ── Render cache ─────────────────────────────────────────────────────────────
+
+class RenderCache:
+    """LRU cache of rendered pages, bounded by the bytes of image data held.
+
+    Keys are content addresses -- ``(pdf_sha256, page_index, dpi, fmt)`` --
+    so the same page of the same document is rendered once no matter how
+    many sessions ask for it.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._pages    = OrderedDict()
+        self._lock     = threading.Lock()
+        self._bytes    = 0
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            page = self._pages.get(key)
+            if page is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._pages.move_to_end(key)
+            return page
+
+    def __contains__(self, key):
+        # A peek for cost estimates: counts no hit or miss and keeps the LRU order.
+        with self._lock:
+            return key in self._pages
+
+    def put(self, key, page):
+        size = len(page["data"]) + len(page["thumb"])
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._pages:
+                return
+            self._pages[key] = page
+            self._bytes     += size
+            while self._bytes > self.max_bytes:
+                _, old = self._pages.popitem(last=False)
+                self._bytes -= len(old["data"]) + len(old["thumb"])
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries":   len(self._pages),
+                "bytes":     self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits":      self.hits,
+                "misses":    self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+
+render_cache = RenderCache(app.config["RENDER_CACHE_BYTES"])
+
+
+# ── Rendering ────────────────────────────────────────────────────────────────
+
+_pdfrender      = None
+_pdfrender_lock = threading.Lock()
+
+
+def _renderer():
+    """The ``pdfrender`` module, imported on first use.
+
+    Loading PyMuPDF and Pillow is a large share of a cold start, and
+    serving the page, a stored image or /metrics does not need them.
+    """
+    global _pdfrender
+    with _pdfrender_lock:
+        if _pdfrender is None:
+            import pdfrender
+            pdfrender.document_cache.max_bytes = app.config["DOCUMENT_CACHE_BYTES"]
+            _pdfrender = pdfrender
+        return _pdfrender
+
+
+def _render_settings():
+    """The app settings render workers need, passed along with each task."""
+    return {
+        "thumb_width":    app.config["THUMBNAIL_WIDTH"],
+        "band_threshold": app.config["BAND_THRESHOLD_BYTES"],
+        "band_height":    app.config["BAND_HEIGHT"],
+    }
+
+
+def _get_render_pool():
+    """The shared render pool, started on first use.
+
+    Workers come from a forkserver where the platform has one: the app
+    runs request and job threads, and forking a threaded process can copy
+    locks in a held state.  The forkserver preloads the renderer, so each
+    worker starts with PyMuPDF and Pillow already imported.
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is None:
+            if "forkserver" in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context("forkserver")
+                context.set_forkserver_preload(["pdfrender"])
+            else:
+                context = multiprocessing.get_context()
+            _render_pool = ProcessPoolExecutor(
+                max_workers=app.config["RENDER_WORKERS"], mp_context=context,
+                initializer=_renderer().init_worker, initargs=(app.config["DOCUMENT_CACHE_BYTES"],),
+            )
+        return _render_pool
+
+
+def _discard_render_pool(pool):
+    """Drop a broken pool, e.g. after a worker was OOM-killed, so the next
+    conversion starts a fresh one."""
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is pool:
+            _render_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _render_pages(docs, dpi, fmt, opts):
+    """Yield ``(doc, page_index, page, timings)`` for every page of ``docs``, in order.
+
+    ``docs`` is a list of ``(source, digest, indices)``.  Contiguous slices
+    of each document's pages are fanned out over the process pool, a few
+    slices per worker so the first pages come back early.  Every document's slices are
+    queued at once, so a batch keeps the workers busy across document
+    boundaries.  In-memory PDFs are spooled to a temp file once, and the
+    workers are handed its path rather than a pickled copy per slice.  If
+    a worker dies, the pool is replaced and the pages not yet yielded are
+    retried once on the new one.  Falls back to rendering
+    in the calling thread when there is a single page, only one worker is
+    configured, or the platform cannot start worker processes.
+    """
+    render      = _renderer()
+    page_count  = sum(len(indices) for _, _, indices in docs)
+    workers     = min(app.config["RENDER_WORKERS"], page_count)
+    settings    = _render_settings()
+
+    if workers > 1:
+        # Pages not yet yielded, per document, in case the pool breaks.
+        remaining = [list(indices) for _, _, indices in docs]
+        sources   = [source for source, _, _ in docs]
+        try:
+            for attempt in (1, 2):
+                try:
+                    pool = _get_render_pool()
+                except (OSError, NotImplementedError) as e:
+                    app.logger.warning("Process pool unavailable, rendering serially: %s", e)
+                    docs = [(source, digest, remaining[d]) for d, (source, digest, _) in enumerate(docs)]
+                    break
+                from concurrent.futures.process import BrokenProcessPool
+
+                sources = [_spool_source(source) if isinstance(source, bytes) and remaining[d] else source
+                           for d, source in enumerate(sources)]
+                size    = -(-sum(map(len, remaining)) // (workers * 4))
+                futures = []
+                try:
+                    futures.extend(
+                        (d, pool.submit(render.render_slice, sources[d], digest, remaining[d][k:k + size],
+                                        dpi, fmt, opts, settings))
+                        for d, (_, digest, _) in enumerate(docs)
+                        for k in range(0, len(remaining[d]), size)
+                    )
+                    for d, future in futures:
+                        for rendered in future.result():
+                            remaining[d].pop(0)
+                            yield (d, *rendered)
+                    return
+                except BrokenProcessPool:
+                    _discard_render_pool(pool)
+                    if attempt == 2:
+                        raise
+                    app.logger.warning("Render worker died; retrying the remaining pages on a new pool")
+                finally:
+                    for _, future in futures:
+                        future.cancel()
+        finally:
+            for d, source in enumerate(sources):
+                if source is not docs[d][0]:
+                    _release_source(source)
+
+    for d, (source, digest, indices) in enumerate(docs):
+        if not indices:
+            continue
+        clock = time.perf_counter()
+        with render.document_cache.open(source, digest) as pdf_doc:
+            _record_stage("open", time.perf_counter() - clock)
+            for i in indices:
+                yield (d, i, *render.render_page(pdf_doc[i], dpi, fmt, opts, settings))
+
+
+def _render_cache_key(digest, index, dpi, fmt, opts):
+    return (digest, index, dpi, fmt, tuple(sorted(opts.items())))
+
+
+def _iter_rendered_documents(docs, dpi, fmt, opts):
+    """Yield ``(doc, page_index, page)`` for every page of ``docs`` in order, cache first.
+
+    ``docs`` is a list of ``(source, digest, indices)``.  Only the pages
+    missing from the render cache are handed to ``_render_pages``; cached
+    ones skip both rasterising and encoding.
+    """
+    keys    = [{i: _render_cache_key(digest, i, dpi, fmt, opts) for i in indices} for _, digest, indices in docs]
+    cached  = [{i: render_cache.get(key) for i, key in doc_keys.items()} for doc_keys in keys]
+    fresh   = _render_pages(
+        [(source, digest, [i for i in indices if cached[d][i] is None])
+         for d, (source, digest, indices) in enumerate(docs)],
+        dpi, fmt, opts,
+    )
+
+    try:
+        for d, (_, _, indices) in enumerate(docs):
+            for i in indices:
+                page = cached[d][i]
+                if page is None:
+                    _, _, page, timings = next(fresh)
+                    for stage, seconds in timings.items():
+                        _record_stage(stage, seconds)
+                    metrics.inc("pdf2img_pages_rendered_total")
+                    # The cache key is a content address, so it doubles as the ETag.
+                    page["etag"] = hashlib.sha256(repr(keys[d][i]).encode()).hexdigest()[:32]
+                    render_cache.put(keys[d][i], page)
+                yield d, i, page
+    finally:
+        fresh.close()
+
+
+def _iter_rendered_pages(source, digest, indices, dpi, fmt, opts):
+    """Yield ``(page_index, page)`` for one document's ``indices`` in order."""
+    rendered = _iter_rendered_documents([(source, digest, indices)], dpi, fmt, opts)
+    try:
+        for _, i, page in rendered:
+            yield i, page
+    finally:
+        rendered.close()
+
+
+# ── Jobs ─────────────────────────────────────────────────────────────────────
+
+class JobQueue:
+    """Background conversions with a concurrency limit and a bounded backlog.
+
+    At most ``concurrency`` jobs render at once; up to ``max_queued`` more
+    wait their turn and anything beyond that is refused.  Job records are
+    kept for ``ttl`` seconds after they finish so clients can poll them.
+    Each job's id is the id of the session it fills, and its record is also
+    written to the session ``store`` whenever it changes, so with the disk
+    store any process sharing it can report the job.
+    """
+
+    def __init__(self, concurrency, max_queued, ttl, store):
+        self.concurrency = concurrency
+        self.max_queued  = max_queued
+        self.ttl         = ttl
+        self.store       = store
+        self._executor   = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="job")
+        self._jobs       = {}
+        self._lock       = threading.Lock()
+        self._pending    = 0
+
+    def submit(self, job_id, fn, *args):
+        """Queue ``fn(job, *args)``; returns the job record, or None if full."""
+        with self._lock:
+            self._prune(time.monotonic())
+            if self._pending >= self.concurrency + self.max_queued:
+                return None
+            self._pending += 1
+            job = self._jobs[job_id] = {
+                "status": "queued", "page_count": 0, "pages_done": 0,
+                "error": None, "finished": None,
+            }
+        self.publish(job_id)
+        self._executor.submit(self._run, job_id, job, fn, *args)
+        return job
+
+    def publish(self, job_id):
+        """Write the job's record to the session store, e.g. after progress."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            # "finished" is a monotonic time, meaningless to other processes.
+            record = job and {k: v for k, v in job.items() if k != "finished"}
+        if record:
+            self.store.set_job(job_id, record)
+
+    def get(self, job_id):
+        """The job's record: this process's own, else the one in the session store."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job:
+                return dict(job)
+        return self.store.get_job(job_id)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pending":     self._pending,
+                "concurrency": self.concurrency,
+                "max_queued":  self.max_queued,
+            }
+
+    def _run(self, job_id, job, fn, *args):
+        job["status"] = "running"
+        self.publish(job_id)
+        try:
+            fn(job, *args)
+            job["status"] = "done"
+        except Exception as e:
+            job["status"] = "failed"
+            job["error"]  = f"Conversion failed: {str(e)}"
+        finally:
+            with self._lock:
+                self._pending  -= 1
+                job["finished"] = time.monotonic()
+            self.publish(job_id)
+
+    def _prune(self, now):
+        for job_id, job in list(self._jobs.items()):
+            if job["finished"] is not None and now - job["finished"] >= self.ttl:
+                del self._jobs[job_id]
+
+
+jobs = JobQueue(app.config["JOB_CONCURRENCY"], app.config["JOB_QUEUE_DEPTH"], app.config["SESSION_TTL"],
+               converted_sessions)
+
+
+def _convert_job(job, session_id, source, digest, indices, fmt, dpi, opts):
+    """Job body: render into the session, counting pages as they land.
+
+    Jobs wait for admission however long it takes rather than failing.
+    """
+    try:
+        job["page_count"] = len(indices)
+        jobs.publish(session_id)
+        cost = _estimate_cost([(source, digest, indices)], dpi, fmt, opts)
+        with admission.admit(cost, block=True), _active_conversion():
+            for _, page in _iter_rendered_pages(source, digest, indices, dpi, fmt, opts):
+                with _timed("store"):
+                    converted_sessions.add_page(session_id, page)
+                job["pages_done"] += 1
+                jobs.publish(session_id)
+    finally:
+        _release_source(source)
+
+
+# ── Chunked uploads ──────────────────────────────────────────────────────────
+
+class UploadError(Exception):
+    """A chunked-upload request that cannot be honoured, with its HTTP status."""
+
+    def __init__(self, message, status, **details):
+        super().__init__(message)
+        self.status  = status
+        self.details = details
+
+
+class ChunkedUploadStore:
+    """Resumable uploads assembled from numbered chunks under ``root``.
+
+    Each upload is a directory holding the spool file chunks are appended to
+    and a ``state.json`` with the SHA-256 of every chunk received so far.
+    Chunks must arrive in order.  Re-sending one already received is accepted
+    when its checksum matches, so clients can retry blindly and resume from
+    ``status()``.  An flock on a per-upload lock file serialises writers
+    across worker processes.
+    """
+
+    _VALID_ID = re.compile(r"^[0-9a-f]{32}$")
+
+    def __init__(self, root, max_bytes, ttl):
+        self.root      = root
+        self.max_bytes = max_bytes
+        self.ttl       = ttl
+        os.makedirs(root, exist_ok=True)
+
+    def create(self, filename, size=None):
+        if size is not None and size > self.max_bytes:
+            raise UploadError(f"Upload exceeds the {self.max_bytes}-byte limit", 413)
+        self._sweep()
+        upload_id = uuid.uuid4().hex
+        path      = os.path.join(self.root, upload_id)
+        os.makedirs(path)
+        open(os.path.join(path, "data.pdf"), "wb").close()
+        self._save(path, {"filename": filename, "size": size, "chunks": [], "bytes": 0, "sha256": None})
+        return upload_id
+
+    def status(self, upload_id):
+        path = self._dir(upload_id)
+        try:
+            with open(os.path.join(path, "state.json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise UploadError("Upload not found", 404)
+
+    def put_chunk(self, upload_id, index, stream, checksum=None):
+        """Append chunk ``index`` read from ``stream``; returns the new state."""
+        path = self._dir(upload_id)
+        with self._locked(path) as state:
+            if state["sha256"]:
+                raise UploadError("Upload is already finalized", 409)
+            received = len(state["chunks"])
+
+            if index < received:
+                if checksum and checksum != state["chunks"][index]:
+                    raise UploadError(f"Chunk {index} was already received with a different checksum", 409)
+                return state
+            if index > received:
+                raise UploadError(f"Expected chunk {received}", 409, next_chunk=received)
+
+            digest = hashlib.sha256()
+            size   = 0
+            with open(os.path.join(path, "data.pdf"), "r+b") as out:
+                out.seek(state["bytes"])
+                out.truncate()  # drop whatever a failed earlier attempt left behind
+                for block in iter(lambda: stream.read(1024 * 1024), b""):
+                    size += len(block)
+                    if state["bytes"] + size > self.max_bytes:
+                        out.truncate(state["bytes"])
+                        raise UploadError(f"Upload exceeds the {self.max_bytes}-byte limit", 413)
+                    digest.update(block)
+                    out.write(block)
+                if checksum and checksum != digest.hexdigest():
+                    out.truncate(state["bytes"])
+                    raise UploadError(f"Checksum mismatch for chunk {index}", 400, next_chunk=received)
+
+            state["chunks"].append(digest.hexdigest())
+            state["bytes"] += size
+            return state
+
+    def finalize(self, upload_id, checksum=None):
+        """Seal the upload once the whole file's SHA-256 checks out."""
+        path = self._dir(upload_id)
+        with self._locked(path) as state:
+            if state["sha256"]:
+                return state
+            if state["size"] is not None and state["bytes"] != state["size"]:
+                raise UploadError(f"Received {state['bytes']} of {state['size']} bytes", 409,
+                                  next_chunk=len(state["chunks"]))
+            digest = hashlib.sha256()
+            with open(os.path.join(path, "data.pdf"), "rb") as f:
+                for block in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(block)
+            if checksum and checksum != digest.hexdigest():
+                raise UploadError("Checksum mismatch for the assembled file", 400)
+            state["sha256"] = digest.hexdigest()
+            return state
+
+    def take(self, upload_id):
+        """Hand a finalized upload to a conversion as ``(path, sha256)``.
+
+        The path is a fresh hard link, so it is the caller's to release and
+        the upload itself can be converted again until it expires.
+        """
+        path  = self._dir(upload_id)
+        state = self.status(upload_id)
+        fd, link = tempfile.mkstemp(prefix="pdf2img-", suffix=".pdf")
+        os.close(fd)
+        os.remove(link)
+        _link_file(os.path.join(path, "data.pdf"), link)
+        return link, state["sha256"]
+
+    def _dir(self, upload_id):
+        if not self._VALID_ID.match(upload_id) or not os.path.isdir(os.path.join(self.root, upload_id)):
+            raise UploadError("Upload not found", 404)
+        return os.path.join(self.root, upload_id)
+
+    @contextmanager
+    def _locked(self, path):
+        with open(os.path.join(path, "lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            with open(os.path.join(path, "state.json")) as f:
+                state = json.load(f)
+            yield state
+            self._save(path, state)
+
+    @staticmethod
+    def _save(path, state):
+        tmp = os.path.join(path, "state.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, os.path.join(path, "state.json"))
+
+    def _sweep(self):
+        now = time.time()
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            try:
+                if now - os.stat(path).st_mtime >= self.ttl:
+                    shutil.rmtree(path, ignore_errors=True)
+            except FileNotFoundError:
+                pass
+
+
+chunked_uploads = ChunkedUploadStore(app.config["UPLOAD_DIR"], app.config["UPLOAD_MAX_BYTES"],
+                                     app.config["SESSION_TTL"])
+
+
+# ── Admission control ────────────────────────────────────────────────────────
+
+class Overloaded(Exception):
+    """A conversion was not admitted; retry after ``retry_after`` seconds."""
+
+    def __init__(self, retry_after):
+        super().__init__("Server busy, try again shortly")
+        self.retry_after = retry_after
+
+
+class AdmissionControl:
+    """Admits conversions while their estimated memory fits a shared budget.
+
+    Requests are admitted first come, first served.  One that does not fit
+    waits in a queue of at most ``max_queued`` until earlier conversions
+    release enough budget, for up to ``max_wait`` seconds, and is then
+    refused.  Background jobs pass ``block=True`` to wait however long it
+    takes; their own queue already bounds them.  A request larger than the
+    whole budget runs once nothing else is admitted, so it is slowed down
+    rather than starved.  A budget of 0 admits everything.
+    """
+
+    def __init__(self, budget, max_queued, max_wait):
+        self.budget     = budget
+        self.max_queued = max_queued
+        self.max_wait   = max_wait
+        self._cond      = threading.Condition()
+        self._queue     = []
+        self._in_use    = 0
+        self.admitted = self.rejected = 0
+
+    def acquire(self, cost, block=False):
+        """Wait until ``cost`` bytes are admitted; raises Overloaded."""
+        if not self.budget or not cost:
+            return
+        ticket = object()
+        with self._cond:
+            if not block and len(self._queue) >= self.max_queued:
+                self.rejected += 1
+                raise Overloaded(max(1, int(self.max_wait)))
+            self._queue.append(ticket)
+            deadline = None if block else time.monotonic() + self.max_wait
+            try:
+                while not (self._queue[0] is ticket
+                           and (self._in_use == 0 or self._in_use + cost <= self.budget)):
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        self.rejected += 1
+                        raise Overloaded(max(1, int(self.max_wait)))
+                    self._cond.wait(remaining)
+                self._in_use  += cost
+                self.admitted += 1
+            finally:
+                self._queue.remove(ticket)
+                self._cond.notify_all()
+
+    def release(self, cost):
+        if not self.budget or not cost:
+            return
+        with self._cond:
+            self._in_use -= cost
+            self._cond.notify_all()
+
+    @contextmanager
+    def admit(self, cost, block=False):
+        self.acquire(cost, block)
+        try:
+            yield
+        finally:
+            self.release(cost)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "budget":   self.budget,
+                "in_use":   self._in_use,
+                "waiting":  len(self._queue),
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+            }
+
+
+class RateLimiter:
+    """Per-client token buckets refilled at ``per_minute`` requests a minute.
+
+    Each client may spend up to ``burst`` tokens at once.  Buckets idle long
+    enough to be full again are forgotten once the table grows large.
+    """
+
+    PRUNE_AT = 4096
+
+    def __init__(self, per_minute, burst):
+        self.rate     = per_minute / 60
+        self.burst    = burst
+        self._buckets = {}  # client -> (tokens, last update)
+        self._lock    = threading.Lock()
+        self.limited  = 0
+
+    def take(self, client):
+        """Spend a token; returns 0, or the seconds until one is available."""
+        if self.rate <= 0:
+            return 0
+        now = time.monotonic()
+        with self._lock:
+            tokens, stamp = self._buckets.get(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - stamp) * self.rate)
+            if tokens >= 1:
+                self._buckets[client] = (tokens - 1, now)
+                if len(self._buckets) > self.PRUNE_AT:
+                    self._prune(now)
+                return 0
+            self._buckets[client] = (tokens, now)
+            self.limited += 1
+            return (1 - tokens) / self.rate
+
+    def _prune(self, now):
+        refill = self.burst / self.rate
+        for client, (_, stamp) in list(self._buckets.items()):
+            if now - stamp >= refill:
+                del self._buckets[client]
+
+
+def _estimate_cost(docs, dpi, fmt, opts):
+    """Estimated peak memory of a conversion: the pixmaps that can be in flight at once.
+
+    ``docs`` is a list of ``(source, digest, indices)``.  At most
+    RENDER_WORKERS pages render together and each pixmap is freed once it
+    is encoded, so the estimate is the largest page left to render x DPI^2
+    x channels, times the pages that can render at the same time.  Pages
+    the render cache already holds cost nothing; page boxes are read
+    without loading the pages.
+    """
+    render   = _renderer()
+    channels = render.COLORSPACES.get(opts["colorspace"], render.COLORSPACES["rgb"])[2]
+    largest = missing = 0
+    for source, digest, indices in docs:
+        todo = [i for i in indices if _render_cache_key(digest, i, dpi, fmt, opts) not in render_cache]
+        if not todo:
+            continue
+        missing += len(todo)
+        with render.document_cache.open(source, digest) as pdf_doc:
+            boxes   = [pdf_doc.page_cropbox(i) for i in todo]
+            largest = max(largest, max(box.width * box.height for box in boxes))
+    return int(largest * (dpi / 72) ** 2 * channels * min(missing, app.config["RENDER_WORKERS"]))
+
+
+def _lazy_cost(pages):
+    """Estimated peak memory of rendering placeholder ``pages`` of a lazy session.
+
+    Sized like ``_estimate_cost``: the largest placeholder still to render,
+    times the pages that can render at the same time.
+    """
+    colorspaces = _renderer().COLORSPACES
+    costs = [
+        p["width"] * p["height"] * colorspaces.get(p["render"]["opts"]["colorspace"], colorspaces["rgb"])[2]
+        for p in pages
+        if "render" in p and _render_cache_key(p["render"]["digest"], p["render"]["index"], p["render"]["dpi"],
+                                               p["format"], p["render"]["opts"]) not in render_cache
+    ]
+    return max(costs) * min(len(costs), app.config["RENDER_WORKERS"]) if costs else 0
+
+
+def _once(fn):
+    """Wrap cleanup reachable from two paths so that only its first call runs."""
+    lock, done = threading.Lock(), []
+
+    def wrapper():
+        with lock:
+            if done:
+                return
+            done.append(True)
+        fn()
+    return wrapper
+
+
+def _overloaded(e):
+    metrics.inc("pdf2img_rejected_total", reason="admission")
+    return (jsonify({"error": str(e)}), 429, {"Retry-After": str(e.retry_after)})
+
+
+admission = AdmissionControl(app.config["ADMISSION_BUDGET_BYTES"],
+                             app.config["ADMISSION_QUEUE"], app.config["ADMISSION_WAIT"])
+rate_limiter = RateLimiter(app.config["RATE_LIMIT_PER_MINUTE"], app.config["RATE_LIMIT_BURST"])
+
+
+# ── Routes ───────────────────────────────────────────────────────────────────
+
+def _conversion_request():
+    """Validate the upload form shared by the conversion routes.
+
+    Returns ``((file, fmt, dpi, pages, opts), None)`` or
+    ``(None, (message, status))``.
+    ``file`` is the uploaded file, or the id of a finalized chunked upload
+    given as ``upload_id``.  ``pages`` is the raw page selection, resolved by
+    ``parse_pages`` once the page count is known.
+    """
+    upload_id = request.form.get("upload_id")
+    if upload_id:
+        try:
+            state = chunked_uploads.status(upload_id)
+        except UploadError as e:
+            return None, (str(e), e.status)
+        if not state["sha256"]:
+            return None, ("Upload is not finalized", 409)
+        file = upload_id
+
+    elif "pdf" not in request.files:
+        return None, ("No PDF file uploaded", 400)
+
+    else:
+        file = request.files["pdf"]
+        if not file or file.filename == "":
+            return None, ("No file selected", 400)
+
+        if not file.filename.lower().endswith(".pdf"):
+            return None, ("Please upload a PDF file", 400)
+
+    return (file, *_conversion_options(request.form)), None
+
+
+def _conversion_options(form):
+    """Return ``(fmt, dpi, pages, opts)`` from a conversion form."""
+    render = _renderer()
+    fmt    = form.get("format", "PNG").upper()
+    if fmt not in render.FORMATS:
+        fmt = "PNG"
+
+    try:
+        dpi = max(72, min(300, int(form.get("dpi", 200))))
+    except ValueError:
+        dpi = 200
+
+    pages = form.get("pages", "").strip()
+
+    return fmt, dpi, pages, render.render_options(fmt, form)
+
+
+def _load_upload(file):
+    """Take the uploaded PDF over without copying it through a temp directory.
+
+    Returns ``(source, digest)``.  Uploads buffered in memory come back as
+    bytes.  Spooled ones come back as the path of a hard link to the spool
+    file, which survives the request and is the caller's to release with
+    ``_release_source``.
+    """
+    stream = file.stream
+    if isinstance(stream, io.BytesIO):
+        data = stream.getvalue()
+        with _timed("hash"):
+            return data, hashlib.sha256(data).hexdigest()
+
+    fd, path = tempfile.mkstemp(prefix="pdf2img-", suffix=".pdf")
+    os.close(fd)
+    os.remove(path)
+    _link_file(stream.name, path)
+
+    with _timed("hash"):
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+    return path, digest.hexdigest()
+
+
+def _spool_source(data):
+    """Write an in-memory PDF to a temp file and return its path; ``_release_source`` removes it."""
+    fd, path = tempfile.mkstemp(prefix="pdf2img-", suffix=".pdf")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    return path
+
+
+def _release_source(source):
+    if isinstance(source, str):
+        try:
+            os.remove(source)
+        except FileNotFoundError:
+            pass
+
+
+def _stage_upload(file):
+    """Load the upload and count its pages.
+
+    ``file`` is an uploaded file, a chunked upload id or the bytes of a PDF
+    taken from a batch archive.  Returns ``(source, digest, page_count)``;
+    the source is released again if the file cannot be opened as a PDF.
+    """
+    if isinstance(file, str):
+        source, digest = chunked_uploads.take(file)
+    elif isinstance(file, bytes):
+        with _timed("hash"):
+            source, digest = file, hashlib.sha256(file).hexdigest()
+    else:
+        source, digest = _load_upload(file)
+    try:
+        with _timed("open"), _renderer().document_cache.open(source, digest) as pdf_doc:
+            page_count = pdf_doc.page_count
+    except Exception:
+        _release_source(source)
+        raise
+    return source, digest, page_count
+
+
+def _stage_conversion(file, pages):
+    """Stage the upload and resolve the page selection against it.
+
+    Returns ``((source, digest, page_count, indices), None)`` or
+    ``(None, error_response)``.
+    """
+    try:
+        source, digest, page_count = _stage_upload(file)
+    except Exception as e:
+        return None, (jsonify({"error": f"Conversion failed: {str(e)}"}), 500)
+
+    try:
+        indices = _renderer().parse_pages(pages, page_count)
+    except ValueError as e:
+        _release_source(source)
+        return None, (str(e), 400)
+
+    return (source, digest, page_count, indices), None
+
+
+# The page has no template logic, so it is encoded, compressed and hashed
+# once instead of going through Jinja on every request.  Browsers and CDNs
+# may keep it for INDEX_MAX_AGE seconds, then revalidate with the ETag.
+_INDEX_HTML      = HTML.encode()
+_INDEX_HTML_GZIP = gzip.compress(_INDEX_HTML, mtime=0)
+_INDEX_ETAG      = hashlib.sha256(_INDEX_HTML).hexdigest()[:32]
+INDEX_MAX_AGE    = 300
+
+
 @app.route("/")
 def index():
-    return render_template_string(HTML)
+    gzipped  = request.accept_encodings["gzip"] > 0
+    response = Response(_INDEX_HTML_GZIP if gzipped else _INDEX_HTML, mimetype="text/html")
+    if gzipped:
+        response.headers["Content-Encoding"] = "gzip"
+    response.vary.add("Accept-Encoding")
+    response.set_etag(f"{_INDEX_ETAG}-gzip" if gzipped else _INDEX_ETAG)
+    response.cache_control.public  = True
+    response.cache_control.max_age = INDEX_MAX_AGE
+    return response.make_conditional(request)
 
 
 @app.route("/convert", methods=["POST"])
 def convert_pdf():
-    if "pdf" not in request.files:
+    """Render the selected pages into a new session and return their metadata.
+
+    With ``lazy`` set, nothing is rendered yet: the document is only opened
+    to record page sizes and kept with the session, and each page renders
+    the first time its image, thumbnail or download is requested.
+    """
+    options, error = _conversion_request()
+    if error:
+        return error
+    file, fmt, dpi, pages, opts = options
+
+    staged, error = _stage_conversion(file, pages)
+    if error:
+        return error
+    source, digest, page_count, indices = staged
+
+    try:
+        if _renderer().form_flag(request.form, "lazy"):
+            return _convert_lazy(source, digest, indices, fmt, dpi, opts)
+
+        session_id = str(uuid.uuid4())
+        pages_meta = []
+
+        with admission.admit(_estimate_cost([(source, digest, indices)], dpi, fmt, opts)), _active_conversion():
+            converted_sessions.create(session_id)
+            rendered = _iter_rendered_pages(source, digest, indices, dpi, fmt, opts)
+            for i, (_, page) in enumerate(rendered):
+                with _timed("store"):
+                    converted_sessions.add_page(session_id, page)
+                pages_meta.append(_page_json(session_id, i, page))
+
+        # Metadata only; the images themselves are fetched from /pages.
+        return jsonify({"session_id": session_id, "pages": pages_meta})
+
+    except Overloaded as e:
+        return _overloaded(e)
+
+    except Exception as e:
+        return jsonify({"error": f"Conversion failed: {str(e)}"}), 500
+
+    finally:
+        _release_source(source)
+
+
+def _convert_lazy(source, digest, indices, fmt, dpi, opts):
+    """Set up a lazy session: placeholder pages sized for ``dpi`` plus the source."""
+    render = _renderer()
+    mat    = render.fitz.Matrix(dpi / 72, dpi / 72)
+    with _timed("open"), render.document_cache.open(source, digest) as pdf_doc:
+        areas = [(pdf_doc[i].rect * mat).irect for i in indices]
+
+    session_id = str(uuid.uuid4())
+    pages_meta = []
+    converted_sessions.create(session_id)
+    converted_sessions.set_source(session_id, source)
+    for n, (i, area) in enumerate(zip(indices, areas)):
+        page = {
+            "page":   i + 1,
+            "format": fmt,
+            "width":  area.width,
+            "height": area.height,
+            "render": {"digest": digest, "index": i, "dpi": dpi, "opts": opts},
+        }
+        converted_sessions.add_page(session_id, page)
+        pages_meta.append(_page_json(session_id, n, page))
+
+    return jsonify({"session_id": session_id, "lazy": True, "pages": pages_meta})
+
+
+@app.route("/convert/stream", methods=["POST"])
+def convert_pdf_stream():
+    """Like /convert, but streams NDJSON events while pages are rendered.
+
+    Emits one ``start`` event with the session id and page count, one
+    ``page`` event per page (in order) carrying its metadata and URLs, then
+    ``done`` -- or an ``error`` event if rendering fails part way.
+    Page events carry the same metadata as /convert's ``pages`` entries.
+    """
+    options, error = _conversion_request()
+    if error:
+        return error
+    file, fmt, dpi, pages, opts = options
+
+    staged, error = _stage_conversion(file, pages)
+    if error:
+        return error
+    source, digest, page_count, indices = staged
+
+    try:
+        cost = _estimate_cost([(source, digest, indices)], dpi, fmt, opts)
+        admission.acquire(cost)
+    except Overloaded as e:
+        _release_source(source)
+        return _overloaded(e)
+    except Exception as e:
+        _release_source(source)
+        return jsonify({"error": f"Conversion failed: {str(e)}"}), 500
+
+    # Runs when the stream ends, or when the response is closed without the
+    # stream ever having started.
+    @_once
+    def finish():
+        admission.release(cost)
+        _release_source(source)
+
+    session_id = str(uuid.uuid4())
+    converted_sessions.create(session_id)
+
+    def events():
+        try:
+            yield _ndjson(event="start", session_id=session_id,
+                          page_count=len(indices), document_pages=page_count, format=fmt)
+            with _active_conversion():
+                rendered = _iter_rendered_pages(source, digest, indices, dpi, fmt, opts)
+                for i, (_, page) in enumerate(rendered):
+                    with _timed("store"):
+                        converted_sessions.add_page(session_id, page)
+                    yield _ndjson(event="page", **_page_json(session_id, i, page))
+            yield _ndjson(event="done")
+        except Exception as e:
+            yield _ndjson(event="error", error=f"Conversion failed: {str(e)}")
+        finally:
+            finish()
+
+    response = Response(events(), mimetype="application/x-ndjson",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    response.call_on_close(finish)
+    return response
+
+
+def _ndjson(**event):
+    return json.dumps(event) + "\n"
+
+
+@app.route("/convert/batch", methods=["POST"])
+def convert_batch():
+    """Convert many PDFs into one session, grouped per document.
+
+    Takes any number of ``pdf`` files, each a PDF or a ZIP of PDFs, plus the
+    usual conversion fields, which apply to every document.  All pages go
+    through the render pool together.  Documents that cannot be opened, or
+    have no pages in the selection, are listed with an ``error`` and
+    skipped.  Page ``index`` values count across the whole session.
+    """
+    files = [f for f in request.files.getlist("pdf") if f and f.filename]
+    if not files:
         return "No PDF file uploaded", 400
+    fmt, dpi, pages, opts = _conversion_options(request.form)
 
-    file = request.files["pdf"]
-    if not file or file.filename == "":
-        return "No file selected", 400
+    named, error = _batch_documents(files)
+    if error:
+        return error
 
-    if not file.filename.lower().endswith(".pdf"):
-        return "Please upload a PDF file", 400
+    documents, staged = [], []
+    try:
+        for (name, file), folder in zip(named, _batch_folders([name for name, _ in named])):
+            entry = {"name": name, "folder": folder}
+            documents.append(entry)
+            try:
+                source, digest, page_count = _stage_upload(file)
+            except Exception as e:
+                entry["error"] = f"Conversion failed: {str(e)}"
+                continue
+            entry["document_pages"] = page_count
+            try:
+                indices = _renderer().parse_pages(pages, page_count)
+            except ValueError as e:
+                _release_source(source)
+                entry["error"] = str(e)
+                continue
+            entry["pages"] = []
+            staged.append((entry, source, digest, indices))
+
+        session_id = str(uuid.uuid4())
+        cost = _estimate_cost([(source, digest, indices) for _, source, digest, indices in staged],
+                              dpi, fmt, opts)
+
+        with admission.admit(cost), _active_conversion():
+            converted_sessions.create(session_id)
+            rendered = _iter_rendered_documents(
+                [(source, digest, indices) for _, source, digest, indices in staged], dpi, fmt, opts)
+            for n, (d, _, page) in enumerate(rendered):
+                entry = staged[d][0]
+                # Rendered pages may be shared with the render cache; label a copy.
+                page  = dict(page, document=entry["folder"])
+                with _timed("store"):
+                    converted_sessions.add_page(session_id, page)
+                entry["pages"].append(_page_json(session_id, n, page))
+
+        return jsonify({"session_id": session_id, "documents": documents})
+
+    except Overloaded as e:
+        return _overloaded(e)
+
+    except Exception as e:
+        return jsonify({"error": f"Conversion failed: {str(e)}"}), 500
+
+    finally:
+        for _, source, _, _ in staged:
+            _release_source(source)
+
+
+def _batch_documents(files):
+    """Expand a batch upload into ``[(name, file)]``, unpacking ZIP archives.
+
+    PDFs found in archives come back as bytes; their decompressed total is
+    capped at UPLOAD_MAX_BYTES.  Returns ``(documents, None)`` or
+    ``(None, (message, status))``.
+    """
+    documents = []
+    budget    = app.config["UPLOAD_MAX_BYTES"]
+    for file in files:
+        if file.filename.lower().endswith(".pdf"):
+            documents.append((file.filename, file))
+            continue
+        if not file.filename.lower().endswith(".zip"):
+            return None, ("Please upload PDF files or ZIP archives of PDFs", 400)
+        try:
+            with zipfile.ZipFile(file.stream) as archive:
+                for info in archive.infolist():
+                    name = os.path.basename(info.filename)
+                    if (info.is_dir() or info.filename.startswith("__MACOSX/")
+                            or name.startswith(".") or not name.lower().endswith(".pdf")):
+                        continue
+                    budget -= info.file_size
+                    if budget < 0:
+                        return None, ("Archive contents too large", 413)
+                    with _timed("unzip"):
+                        documents.append((name, archive.read(info)))
+        except zipfile.BadZipFile:
+            return None, (f"Not a valid ZIP archive: {file.filename}", 400)
+
+    if not documents:
+        return None, ("No PDF files found", 400)
+    return documents, None
+
+
+def _batch_folders(names):
+    """Unique, filesystem-safe folder names for a batch's documents."""
+    folders, taken = [], set()
+    for n, name in enumerate(names, 1):
+        folder = secure_filename(os.path.splitext(name)[0]) or f"document_{n}"
+        if folder in taken:
+            folder = f"{folder}_{n}"
+        taken.add(folder)
+        folders.append(folder)
+    return folders
+
+
+def _page_json(session_id, index, page):
+    """Public metadata for a stored page; the image bytes stay server-side.
+
+    ``index`` is the page's position in the session, ``page`` its 1-based
+    number in the document.  ``bytes`` and ``colorspace`` are null for lazy
+    pages not rendered yet.
+    """
+    return {
+        "index":         index,
+        "page":          page["page"],
+        "colorspace":    page.get("colorspace"),
+        "width":         page["width"],
+        "height":        page["height"],
+        "bytes":         len(page["data"]) if "data" in page else None,
+        "url":           f"/pages/{session_id}/{index}",
+        "download_url":  f"/download/{session_id}/{index}",
+        "thumbnail_url": f"/thumbnail/{session_id}/{index}",
+    }
 
-    fmt = request.form.get("format", "PNG").upper()
-    if fmt not in ("PNG", "JPEG"):
-        fmt = "PNG"
+
+@app.route("/jobs", methods=["POST"])
+def create_job():
+    """Queue a conversion and return at once; poll GET /jobs/<job_id>.
+
+    Takes the same form as /convert.  Pages become downloadable through the
+    usual /download and /thumbnail routes as they finish, using the job id
+    as the session id.
+    """
+    options, error = _conversion_request()
+    if error:
+        return error
+    file, fmt, dpi, pages, opts = options
+
+    staged, error = _stage_conversion(file, pages)
+    if error:
+        return error
+    source, digest, page_count, indices = staged
+
+    job_id = str(uuid.uuid4())
+    # The session exists from the start, so the job's record can sit beside
+    # it while queued; a refused job leaves it empty to expire.
+    converted_sessions.create(job_id)
+    job = jobs.submit(job_id, _convert_job, job_id, source, digest, indices, fmt, dpi, opts)
+    if job is None:
+        _release_source(source)
+        return jsonify({"error": "Too many conversions queued, try again shortly"}), 429, {"Retry-After": "5"}
+
+    return jsonify({"job_id": job_id, "status_url": f"/jobs/{job_id}"}), 202
+
+
+@app.route("/jobs/<job_id>")
+def job_status(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return "Job not found", 404
+    return jsonify({
+        "job_id":     job_id,
+        "session_id": job_id,
+        "status":     job["status"],
+        "page_count": job["page_count"],
+        "pages_done": job["pages_done"],
+        "error":      job["error"],
+        "pages": [
+            {"url":           f"/pages/{job_id}/{i}",
+             "download_url":  f"/download/{job_id}/{i}",
+             "thumbnail_url": f"/thumbnail/{job_id}/{i}"}
+            for i in range(job["pages_done"])
+        ],
+    })
+
+
+@app.route("/uploads", methods=["POST"])
+def create_upload():
+    """Start a chunked upload for files too big for one request.
+
+    Send the chunks in order with ``PUT /uploads/<upload_id>/<n>`` (n from
+    0, each under MAX_CONTENT_LENGTH, optionally with an ``X-Chunk-SHA256``
+    header), then ``POST /uploads/<upload_id>/finalize``.  The finalized id
+    can be passed as ``upload_id`` instead of ``pdf`` to /convert,
+    /convert/stream and /jobs.
+    """
+    body     = request.get_json(silent=True) or {}
+    filename = str(body.get("filename") or "document.pdf")
+    if not filename.lower().endswith(".pdf"):
+        return jsonify({"error": "Please upload a PDF file"}), 400
 
     try:
-        dpi = max(72, min(300, int(request.form.get("dpi", 200))))
+        size = int(body["size"]) if body.get("size") is not None else None
+        upload_id = chunked_uploads.create(filename, size)
     except ValueError:
-        dpi = 200
+        return jsonify({"error": "Invalid size"}), 400
+    except UploadError as e:
+        return jsonify({"error": str(e), **e.details}), e.status
 
-    with tempfile.TemporaryDirectory() as tmp:
-        pdf_path = os.path.join(tmp, secure_filename(file.filename))
-        file.save(pdf_path)
+    return jsonify({"upload_id": upload_id, "max_chunk_bytes": app.config["MAX_CONTENT_LENGTH"]}), 201
 
-        try:
-            session_id   = str(uuid.uuid4())
-            pdf_doc      = fitz.open(pdf_path)
-            pages_b64    = []
-            session_imgs = []
 
-            for page_num in range(pdf_doc.page_count):
-                page = pdf_doc[page_num]
-                mat  = fitz.Matrix(dpi / 72, dpi / 72)
-                pix  = page.get_pixmap(matrix=mat)
+@app.route("/uploads/<upload_id>")
+def upload_status(upload_id):
+    try:
+        state = chunked_uploads.status(upload_id)
+    except UploadError as e:
+        return jsonify({"error": str(e), **e.details}), e.status
+    return jsonify(_upload_json(upload_id, state))
 
-                img = Image.open(io.BytesIO(pix.tobytes("ppm")))
-                buf = io.BytesIO()
-                img.save(buf, format=fmt)
-                img_bytes = buf.getvalue()
 
-                session_imgs.append({"data": img_bytes, "format": fmt})
-                pages_b64.append(base64.b64encode(img_bytes).decode("utf-8"))
+@app.route("/uploads/<upload_id>/<int:index>", methods=["PUT"])
+def upload_chunk(upload_id, index):
+    try:
+        state = chunked_uploads.put_chunk(upload_id, index, request.stream,
+                                          request.headers.get("X-Chunk-SHA256"))
+    except UploadError as e:
+        return jsonify({"error": str(e), **e.details}), e.status
+    return jsonify(_upload_json(upload_id, state))
 
-            pdf_doc.close()
-            converted_sessions[session_id] = session_imgs
 
-            return jsonify({"session_id": session_id, "pages": pages_b64})
+@app.route("/uploads/<upload_id>/finalize", methods=["POST"])
+def finalize_upload(upload_id):
+    body = request.get_json(silent=True) or {}
+    try:
+        state = chunked_uploads.finalize(upload_id, body.get("sha256"))
+    except UploadError as e:
+        return jsonify({"error": str(e), **e.details}), e.status
+    return jsonify(_upload_json(upload_id, state))
+
+
+def _upload_json(upload_id, state):
+    return {
+        "upload_id":  upload_id,
+        "filename":   state["filename"],
+        "bytes":      state["bytes"],
+        "next_chunk": len(state["chunks"]),
+        "finalized":  state["sha256"] is not None,
+        "sha256":     state["sha256"],
+    }
 
-        except Exception as e:
-            return jsonify({"error": f"Conversion failed: {str(e)}"}), 500
+
+@app.route("/pages/<session_id>/<int:page_index>")
+def page_image(session_id, page_index):
+    """Serve a page inline, cacheable by browsers and CDNs.
+
+    Stored pages never change, so responses carry a strong ETag and a long
+    immutable Cache-Control.  Conditional and Range requests are answered by
+    send_file.
+    """
+    p, error = _session_page(session_id, page_index)
+    if error:
+        return error
+    return _send_page(
+        p, "data", f'image/{p["format"].lower()}',
+        download_name=f'page_{p["page"]}.{p["format"].lower()}',
+    )
+
+
+def _session_page(session_id, page_index):
+    """Look up one page of a session, rendering it first if it is lazy.
+
+    Returns ``(page, None)`` or ``(None, error_response)``.
+    """
+    with _timed("session_lookup"):
+        pages = converted_sessions.get(session_id)
+    if pages is None:
+        return None, ("Session not found", 404)
+    if page_index >= len(pages):
+        return None, ("Page not found", 404)
+    try:
+        with admission.admit(_lazy_cost([pages[page_index]])):
+            _, page = next(_complete_pages(session_id, pages, [page_index]))
+    except LookupError:
+        return None, ("Session not found", 404)
+    except Overloaded as e:
+        return None, _overloaded(e)
+    except Exception as e:
+        return None, (jsonify({"error": f"Conversion failed: {str(e)}"}), 500)
+    return page, None
+
+
+def _complete_pages(session_id, pages, positions):
+    """Yield ``(position, page)`` for ``positions`` of a session, in order.
+
+    Placeholders left by a lazy /convert are rendered from the session's
+    source PDF in one pass, so several share the render pool and cache, and
+    stored back in their slots.  Raises LookupError if the source has been
+    evicted.
+    """
+    lazy = [k for k in positions if "render" in pages[k]]
+    if not lazy:
+        yield from ((k, pages[k]) for k in positions)
+        return
+
+    source = converted_sessions.get_source(session_id)
+    if source is None:
+        raise LookupError(session_id)
+    spec     = pages[lazy[0]]["render"]
+    rendered = _iter_rendered_pages(source, spec["digest"], [pages[k]["render"]["index"] for k in lazy],
+                                    spec["dpi"], pages[lazy[0]]["format"], spec["opts"])
+    try:
+        for k in positions:
+            page = pages[k]
+            if "render" in page:
+                _, page = next(rendered)
+                with _timed("store"):
+                    converted_sessions.set_page(session_id, k, page)
+            yield k, page
+    finally:
+        rendered.close()
+
+
+def _send_page(page, key, mimetype, **kwargs):
+    response = send_file(
+        _page_source(page, key),
+        mimetype=mimetype,
+        etag=f'{page["etag"]}-{key}',
+        conditional=True,
+        max_age=app.config["SESSION_TTL"],
+        **kwargs,
+    )
+    response.cache_control.immutable = True
+    return response
 
 
 @app.route("/download/<session_id>/<int:page_index>")
 def download_page(session_id, page_index):
-    if session_id not in converted_sessions:
-        return "Session not found", 404
-    pages = converted_sessions[session_id]
-    if page_index >= len(pages):
-        return "Page not found", 404
-    p = pages[page_index]
-    return send_file(
-        io.BytesIO(p["data"]),
+    p, error = _session_page(session_id, page_index)
+    if error:
+        return error
+    return _send_page(
+        p, "data", f'image/{p["format"].lower()}',
         as_attachment=True,
-        download_name=f'page_{page_index + 1}.{p["format"].lower()}',
-        mimetype=f'image/{p["format"].lower()}'
+        download_name=f'page_{p["page"]}.{p["format"].lower()}',
     )
 
 
+@app.route("/thumbnail/<session_id>/<int:page_index>")
+def thumbnail(session_id, page_index):
+    p, error = _session_page(session_id, page_index)
+    if error:
+        return error
+    return _send_page(p, "thumb", "image/jpeg")
+
+
 @app.route("/download-all/<session_id>")
 def download_all(session_id):
-    if session_id not in converted_sessions:
+    with _timed("session_lookup"):
+        pages = converted_sessions.get(session_id)
+    if pages is None:
+        return "Session not found", 404
+    if any("render" in p for p in pages) and converted_sessions.get_source(session_id) is None:
         return "Session not found", 404
-    pages = converted_sessions[session_id]
-    buf = io.BytesIO()
-    with zipfile.ZipFile(buf, "w") as zf:
-        for i, p in enumerate(pages):
-            zf.writestr(f'page_{i + 1:03d}.{p["format"].lower()}', p["data"])
-    buf.seek(0)
-    return send_file(buf, as_attachment=True, download_name="pages.zip")
+    # Lazy pages still to render are rendered as the response is produced,
+    # once admitted.
+    cost = _lazy_cost(pages)
+    try:
+        admission.acquire(cost)
+    except Overloaded as e:
+        return _overloaded(e)
+    finish    = _once(lambda: admission.release(cost))
+    completed = _complete_pages(session_id, pages, range(len(pages)))
+    if pages and "document" not in pages[0] and all(p["format"] == "TIFF" for p in pages):
+        try:
+            return _send_multipage_tiff(p for _, p in completed)
+        finally:
+            finish()
+
+    def archive():
+        try:
+            sink = _ZipSink()
+            with zipfile.ZipFile(sink, "w") as zf:
+                for _, p in completed:
+                    name     = f'page_{p["page"]:03d}.{p["format"].lower()}'
+                    if "document" in p:
+                        # Batch sessions get one folder per source file.
+                        name = f'{p["document"]}/{name}'
+                    compress = zipfile.ZIP_STORED if p["format"] in _COMPRESSED_FORMATS else zipfile.ZIP_DEFLATED
+                    with _timed("zip_entry"):
+                        if "data_path" in p:
+                            zf.write(p["data_path"], name, compress_type=compress)
+                        else:
+                            zf.writestr(name, p["data"], compress_type=compress)
+                    yield sink.drain()
+            yield sink.drain()
+        finally:
+            finish()
+
+    response = Response(archive(), mimetype="application/zip",
+                        headers={"Content-Disposition": "attachment; filename=pages.zip"})
+    response.call_on_close(finish)
+    return response
+
+
+# Already-compressed image formats gain nothing from deflate inside the ZIP.
+_COMPRESSED_FORMATS = {"PNG", "JPEG", "WEBP", "TIFF"}
+
+
+def _send_multipage_tiff(pages):
+    """Join a TIFF session's pages into one multi-page document.
+
+    AppendingTiffWriter fixes up each page's IFD offsets as it is appended,
+    so stored pages are copied as encoded rather than decoded and saved
+    again.  It needs to seek, so the document is built in a temporary file.
+    """
+    from PIL import TiffImagePlugin
+
+    out = tempfile.TemporaryFile()
+    with _timed("tiff_join"):
+        with TiffImagePlugin.AppendingTiffWriter(out, new=True) as tf:
+            for p in pages:
+                if "data_path" in p:
+                    with open(p["data_path"], "rb") as f:
+                        shutil.copyfileobj(f, tf)
+                else:
+                    tf.write(p["data"])
+                tf.newFrame()
+        # The writer seeks ``out`` once more when it is collected, so drop it
+        # before rewinding.
+        del tf
+    out.seek(0)
+    return send_file(out, mimetype="image/tiff", as_attachment=True,
+                     download_name="document.tiff")
+
+
+class _ZipSink(io.RawIOBase):
+    """Non-seekable file object that collects ZipFile output for streaming.
+
+    ZipFile notices it cannot seek and writes data descriptors after each
+    entry instead, so the archive can be sent as it is produced.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self):
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+@app.route("/metrics")
+def prometheus_metrics():
+    sessions  = converted_sessions.stats()
+    cache     = render_cache.stats()
+    # Nothing is cached before the renderer is first loaded.
+    documents = _pdfrender.document_cache.stats() if _pdfrender else {}
+    admitted  = admission.stats()
+    gauges = [
+        ("pdf2img_active_conversions", _active_conversions, {}),
+        ("pdf2img_sessions", sessions["sessions"], {}),
+        ("pdf2img_session_bytes", sessions["bytes"], {}),
+        ("pdf2img_render_cache_bytes", cache["bytes"], {}),
+        ("pdf2img_document_cache_bytes", documents.get("bytes", 0), {}),
+        ("pdf2img_jobs_pending", jobs.stats()["pending"], {}),
+        ("pdf2img_admitted_bytes", admitted["in_use"], {}),
+        ("pdf2img_admission_waiting", admitted["waiting"], {}),
+    ]
+    for kind in ("hits", "misses", "evictions", "expirations"):
+        gauges.append(("pdf2img_session_events_total", sessions[kind], {"kind": kind}))
+    for kind in ("hits", "misses", "evictions"):
+        gauges.append(("pdf2img_render_cache_events_total", cache[kind], {"kind": kind}))
+        gauges.append(("pdf2img_document_cache_events_total", documents.get(kind, 0), {"kind": kind}))
+    return Response(metrics.render(gauges), mimetype="text/plain; version=0.0.4")
+
+
+@app.before_request
+def _start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+# Endpoints that start a conversion, and so count against the rate limit.
+_RATE_LIMITED = {"convert_pdf", "convert_pdf_stream", "convert_batch", "create_job"}
+
+
+@app.before_request
+def _rate_limit():
+    if request.endpoint not in _RATE_LIMITED:
+        return None
+    wait = rate_limiter.take(request.remote_addr or "unknown")
+    if not wait:
+        return None
+    metrics.inc("pdf2img_rejected_total", reason="rate_limit")
+    return jsonify({"error": "Too many requests, try again shortly"}), 429, {"Retry-After": str(int(wait) + 1)}
+
+
+@app.after_request
+def _finish_request_timer(response):
+    elapsed = time.perf_counter() - g.get("request_started", time.perf_counter())
+    metrics.observe("pdf2img_request_seconds", elapsed, endpoint=request.endpoint or "unknown")
+    if app.config["SERVER_TIMING"]:
+        # Streamed bodies are produced after this runs, so their rendering
+        # time shows up in /metrics only.
+        entries = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in g.get("stage_times", {}).items()]
+        entries.append(f"total;dur={elapsed * 1000:.1f}")
+        response.headers["Server-Timing"] = ", ".join(entries)
+    return response
+
+
+@app.route("/stats")
+def stats():
+    return jsonify({
+        "sessions":       converted_sessions.stats(),
+        "render_cache":   render_cache.stats(),
+        "document_cache": _pdfrender.document_cache.stats() if _pdfrender else {},
+        "jobs":           jobs.stats(),
+        "admission":      admission.stats(),
+    })
 
 
 if __name__ == "__main__":
@@ -0,0 +1,641 @@
+"""PDF rendering core: rasterise pages and encode them as PNG, JPEG, WebP or TIFF.
+
+Shared by the web app (``index.py``) and the command-line converter
+(``pdf2img.py``), and usable on its own -- nothing here needs Flask::
+
+    from pdfrender import convert
+
+    for page in convert("report.pdf", fmt="JPEG", dpi=150, pages="1-3", quality=85):
+        with open(f'page_{page["page"]:03d}.jpeg', "wb") as f:
+            f.write(page["data"])
+"""
+import os
+import io
+import re
+import struct
+import threading
+import zlib
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import fitz  # PyMuPDF
+from PIL import Image, ImageChops
+
+
+# ── Library API ──────────────────────────────────────────────────────────────
+
+# Render settings used when the caller gives none; the web app takes its own
+# from app.config.
+DEFAULT_SETTINGS = {
+    "thumb_width":    300,
+    "band_threshold": 64 * 1024 * 1024,
+    "band_height":    512,
+}
+
+# The encoder fields convert() accepts, as the web form names them.
+_OPTION_FIELDS = {"colorspace", "threshold", "quality", "progressive", "optimize", "lossless", "compress_level"}
+
+
+def convert(source, fmt="PNG", dpi=200, pages=None, settings=None, **options):
+    """Render ``source`` page by page, yielding each page as soon as it is encoded.
+
+    ``source`` is a path or the bytes of a PDF.  ``pages`` is a selection
+    like ``"1-3,7"`` or a sequence of 1-based page numbers; None renders
+    every page.  ``options`` are the web form's encoder fields: ``quality``,
+    ``colorspace``, ``threshold``, ``progressive``, ``optimize``,
+    ``lossless`` and ``compress_level``.  Each page is a dict with ``page``
+    (its number), ``data`` (the encoded image), ``format``, ``colorspace``,
+    ``width``, ``height`` and ``thumb`` (a small JPEG preview).
+
+    Raises ValueError for an unknown format or an unusable page selection,
+    and TypeError for unknown options.
+    """
+    fmt = fmt.upper()
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format: {fmt!r}")
+    unknown = set(options) - _OPTION_FIELDS
+    if unknown:
+        raise TypeError(f"Unknown option(s): {', '.join(sorted(unknown))}")
+    opts    = render_options(fmt, {name: str(value) for name, value in options.items()})
+    pdf_doc = _open_pdf(source)
+    try:
+        indices = _page_indices(pages, pdf_doc.page_count)
+    except Exception:
+        pdf_doc.close()
+        raise
+    return _convert(pdf_doc, indices, dpi, fmt, opts, dict(DEFAULT_SETTINGS, **(settings or {})))
+
+
+def _convert(pdf_doc, indices, dpi, fmt, opts, settings):
+    try:
+        for i in indices:
+            yield render_page(pdf_doc[i], dpi, fmt, opts, settings)[0]
+    finally:
+        pdf_doc.close()
+
+
+def select_pages(source, pages=None):
+    """The page numbers ``convert`` would render for ``pages``, in order."""
+    pdf_doc = _open_pdf(source)
+    try:
+        return [i + 1 for i in _page_indices(pages, pdf_doc.page_count)]
+    finally:
+        pdf_doc.close()
+
+
+def _page_indices(pages, page_count):
+    if pages is None or isinstance(pages, str):
+        return parse_pages(pages or "", page_count)
+    numbers = sorted(set(pages))
+    if not numbers or numbers[0] < 1 or numbers[-1] > page_count:
+        raise ValueError(f"Page numbers must be between 1 and {page_count}")
+    return [n - 1 for n in numbers]
+
+
+# ── Options ──────────────────────────────────────────────────────────────────
+
+def render_options(fmt, form):
+    """Colorspace and encoder settings for ``fmt`` from a conversion form.
+
+    ``form`` maps field names to strings, like a request's form data.
+    ``colorspace`` is one of ``rgb`` (the default), ``gray``, ``bilevel``
+    (with ``threshold``, 0-255), ``alpha`` or ``auto``; JPEG cannot carry
+    alpha, so it gets ``rgb`` instead.  The remaining keys are Pillow save()
+    keywords.  Like ``dpi``, numbers are clamped to their range and fall
+    back to the default when malformed.  TIFF pages are always
+    deflate-compressed.
+    """
+    def number(name, default, low, high):
+        try:
+            return max(low, min(high, int(form.get(name, default))))
+        except ValueError:
+            return default
+
+    colorspace = form.get("colorspace", "rgb").lower()
+    if colorspace not in COLORSPACES and colorspace != "auto":
+        colorspace = "rgb"
+    if colorspace == "alpha" and fmt == "JPEG":
+        colorspace = "rgb"
+    # Pillow writes gray WebP as RGB, so probing could only mislabel the file.
+    if colorspace == "auto" and fmt == "WEBP":
+        colorspace = "rgb"
+    opts = {"colorspace": colorspace, "threshold": number("threshold", 128, 0, 255)}
+
+    if fmt == "JPEG":
+        opts.update(quality=number("quality", 75, 1, 100),
+                    progressive=form_flag(form, "progressive"),
+                    optimize=form_flag(form, "optimize"))
+    elif fmt == "WEBP":
+        opts.update(quality=number("quality", 80, 1, 100),
+                    lossless=form_flag(form, "lossless"))
+    elif fmt == "TIFF":
+        opts.update(compression="tiff_adobe_deflate")
+    else:
+        opts.update(compress_level=number("compress_level", _PNG_DEFAULT_LEVEL, 0, 9))
+    return opts
+
+
+def form_flag(form, name):
+    return form.get(name, "").lower() in ("1", "true", "on", "yes")
+
+
+def parse_pages(spec, page_count):
+    """Turn a selection like ``"1-3,7,10-"`` into sorted 0-based page indices.
+
+    Page numbers are 1-based and ranges are inclusive; an open end runs to
+    the last page and an open start from the first.  An empty spec selects
+    every page.  Numbers past the end are ignored, but a selection that
+    matches no page at all raises ValueError, as does malformed input.
+    """
+    if not spec:
+        return list(range(page_count))
+
+    selected = set()
+    for part in spec.split(","):
+        part = part.strip()
+        m = re.fullmatch(r"(\d*)\s*-\s*(\d*)|(\d+)", part)
+        if not m or part == "-":
+            raise ValueError(f"Invalid page selection: {part!r}")
+        if m.group(3):
+            first = last = int(m.group(3))
+        else:
+            first = int(m.group(1) or 1)
+            # An open end past the last page selects nothing rather than
+            # reading as a backwards range.
+            last  = int(m.group(2)) if m.group(2) else max(first, page_count)
+        if first < 1 or last < first:
+            raise ValueError(f"Invalid page range: {part!r}")
+        selected.update(range(first - 1, min(last, page_count)))
+
+    if not selected:
+        raise ValueError(f"No pages selected; the document has {page_count} page(s)")
+    return sorted(selected)
+
+
+# ── Rendering ────────────────────────────────────────────────────────────────
+
+_PIL_MODES = {1: "L", 3: "RGB", 4: "RGBA"}
+
+# The output formats, with the Pillow save() keywords each takes from the request.
+FORMATS = {
+    "PNG":  ("compress_level",),
+    "JPEG": ("quality", "progressive", "optimize"),
+    "WEBP": ("quality", "lossless"),
+    "TIFF": ("compression",),
+}
+
+# MuPDF's own PNG writer deflates at zlib's default level.
+_PNG_DEFAULT_LEVEL = 6
+
+# Colorspace modes: how each is rasterised and the samples per pixel it
+# costs.  Bilevel pages are rasterised gray and thresholded at encode time.
+COLORSPACES = {
+    "rgb":     ("RGB", False, 3),
+    "gray":    ("GRAY", False, 1),
+    "bilevel": ("GRAY", False, 1),
+    "alpha":   ("RGB", True, 4),
+}
+
+
+def _pixmap_args(colorspace):
+    """``get_pixmap`` keywords for a colorspace mode."""
+    name, alpha, _ = COLORSPACES[colorspace]
+    return {"colorspace": fitz.csGRAY if name == "GRAY" else fitz.csRGB, "alpha": alpha}
+
+
+def _bilevel(img, threshold):
+    """Threshold an 8-bit gray image into a 1-bit one."""
+    return img.point([255 if v >= threshold else 0 for v in range(256)], "1")
+
+
+def _encode_pixmap(pix, fmt, opts, threshold=None):
+    """Encode a pixmap with at most one intermediate full-frame copy.
+
+    PyMuPDF writes PNG itself at the default compression level.  Everything
+    else hands the pixmap's sample buffer to Pillow via ``_pixmap_image``,
+    skipping the PPM round trip.  With a ``threshold`` the (gray) pixmap is
+    encoded as a 1-bit image; TIFF then uses CCITT Group 4.
+    """
+    if (fmt == "PNG" and threshold is None
+            and opts.get("compress_level", _PNG_DEFAULT_LEVEL) == _PNG_DEFAULT_LEVEL):
+        return pix.tobytes("png")
+
+    return _encode_image(_pixmap_image(pix), fmt, opts, threshold)
+
+
+def _pixmap_image(pix):
+    """A Pillow image of the pixmap's samples.
+
+    Gray pixmaps share the sample buffer.  Pillow cannot map RGB samples in
+    place, so RGB and alpha pixmaps are copied into a Pillow frame at 4
+    bytes per pixel.  MuPDF premultiplies colour by alpha, so alpha pixmaps
+    are read with Pillow's premultiplied raw mode and come out as straight
+    RGBA.
+    """
+    mode = _PIL_MODES[pix.n]
+    raw  = "RGBa" if pix.alpha else mode
+    return Image.frombuffer(mode, (pix.width, pix.height), pix.samples_mv, "raw", raw, pix.stride, 1)
+
+
+def _encode_image(img, fmt, opts, threshold=None):
+    save = {k: opts[k] for k in FORMATS[fmt] if k in opts}
+    if threshold is not None:
+        img = _bilevel(img, threshold)
+        if fmt == "TIFF":
+            save["compression"] = "group4"
+    buf = io.BytesIO()
+    img.save(buf, format=fmt, **save)
+    return buf.getvalue()
+
+
+def _render_thumbnail(page, width):
+    """Render the small RGB pixmap behind the JPEG preview, at a low zoom."""
+    zoom = width / page.rect.width
+    return page.get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+
+
+# Per-channel difference below which a thumbnail pixel counts as grey (JPEG
+# scans are rarely exactly neutral), and the share of mid-tone pixels a page
+# may have and still be treated as bilevel.
+_PROBE_COLOR_TOLERANCE  = 12
+_PROBE_MIDTONE_FRACTION = 0.01
+
+# Formats where ``auto`` may go down to bilevel: a thresholded JPEG is no
+# smaller than a gray one.
+_BILEVEL_FORMATS = {"PNG", "TIFF"}
+
+
+def _probe_colorspace(img):
+    """``rgb`` or ``gray``: whether a page needs colour, judged from its RGB thumbnail."""
+    r, g, b = img.split()
+    if max(ImageChops.difference(r, g).getextrema()[1],
+           ImageChops.difference(g, b).getextrema()[1]) > _PROBE_COLOR_TOLERANCE:
+        return "rgb"
+    return "gray"
+
+
+def _probe_bilevel(img):
+    """Whether an 8-bit gray image has almost no intermediate tones.
+
+    Line art, blank pages and bilevel scans do.  The image must be at full
+    resolution: downscaling greys every edge, so a thumbnail never passes.
+    """
+    histogram = img.histogram()
+    return sum(histogram[32:224]) <= _PROBE_MIDTONE_FRACTION * img.width * img.height
+
+
+_PNG_COLOR_TYPES = {1: 0, 3: 2, 4: 6}
+
+
+def _png_chunk(tag, data):
+    return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+
+
+def _render_banded_png(page, mat, band_height, level, colorspace, threshold):
+    """Render a page as PNG in horizontal bands of ``band_height`` rows.
+
+    The page is interpreted once into a display list, then each band is
+    rasterised with a clip rectangle and its rows are fed straight into a
+    zlib stream, so peak memory is one band plus the compressed output
+    rather than a whole-page pixmap.  Bilevel bands are thresholded and
+    packed to 1 bit per pixel on the way.  Returns ``(png_bytes, width,
+    height)``.
+    """
+    area   = (page.rect * mat).irect
+    zoom   = mat.d
+    dl     = page.get_displaylist()
+    zs     = zlib.compressobj(level)
+    out    = io.BytesIO()
+    width  = None
+    args   = _pixmap_args(colorspace)
+
+    for top in range(area.y0, area.y1, band_height):
+        bottom = min(top + band_height, area.y1)
+        clip   = fitz.Rect(page.rect.x0, top / zoom, page.rect.x1, bottom / zoom)
+        pix    = dl.get_pixmap(matrix=mat, clip=clip, **args)
+
+        if width is None:
+            width = pix.width
+            depth, color_type = (1, 0) if colorspace == "bilevel" else (8, _PNG_COLOR_TYPES[pix.n])
+            out.write(b"\x89PNG\r\n\x1a\n")
+            out.write(_png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, area.height, depth,
+                                                     color_type, 0, 0, 0)))
+
+        if colorspace == "bilevel":
+            img  = Image.frombuffer("L", (pix.width, pix.height), pix.samples_mv, "raw", "L", pix.stride, 1)
+            rows, stride = _bilevel(img, threshold).tobytes(), (pix.width + 7) // 8
+            del img
+        elif pix.alpha:
+            # PNG wants straight alpha; MuPDF's samples are premultiplied.
+            rows, stride = _pixmap_image(pix).tobytes(), pix.width * 4
+        else:
+            rows, stride = pix.samples_mv, pix.stride
+        first = top - pix.y
+        # Filter type 0 (None) per scanline; one IDAT chunk per band.
+        idat = b"".join(zs.compress(b"\x00" + rows[r * stride:(r + 1) * stride])
+                        for r in range(first, first + bottom - top))
+        if idat:
+            out.write(_png_chunk(b"IDAT", idat))
+        del rows, pix
+
+    out.write(_png_chunk(b"IDAT", zs.flush()))
+    out.write(_png_chunk(b"IEND", b""))
+    return out.getvalue(), width, area.height
+
+
+# Decodable embedded image types, by the extension extract_image() reports.
+_EMBEDDED_FORMATS = {"jpeg": "JPEG", "png": "PNG"}
+
+# Slack, as a fraction of the page or image size, for an embedded image to
+# count as covering the page and as already being at the requested size.
+_FULL_PAGE_TOLERANCE = 0.01
+
+
+def _full_page_image(page):
+    """Return ``extract_image()`` output if the page is one full-page image.
+
+    That is the shape of scanner output: an unrotated page whose only visible
+    content is a single opaque RGB or gray image covering it, upright (an
+    invisible OCR text layer is fine).  Anything else returns None.
+    """
+    images = page.get_images(full=True)
+    if len(images) != 1 or page.rotation or page.first_annot or page.first_widget:
+        return None
+    xref, smask = images[0][0], images[0][1]
+    doc = page.parent
+    if smask or doc.xref_get_key(xref, "Decode")[0] != "null" or doc.xref_get_key(xref, "ImageMask")[1] == "true":
+        return None
+
+    placements = page.get_image_rects(xref, transform=True)
+    if len(placements) != 1:
+        return None
+    rect, matrix = placements[0]
+    slack = _FULL_PAGE_TOLERANCE * max(page.rect.width, page.rect.height)
+    if (matrix.b or matrix.c or matrix.a <= 0 or matrix.d <= 0
+            or any(abs(a - b) > slack for a, b in zip(rect, page.rect))):
+        return None
+    if page.get_drawings() or any(span["type"] != 3 for span in page.get_texttrace()):
+        return None
+
+    info = doc.extract_image(xref)
+    if not info or info["colorspace"] not in (1, 3) or info["ext"] not in _EMBEDDED_FORMATS:
+        return None
+    return info
+
+
+def _embedded_size_matches(info, area):
+    return (abs(info["width"] - area.width) <= _FULL_PAGE_TOLERANCE * area.width
+            and abs(info["height"] - area.height) <= _FULL_PAGE_TOLERANCE * area.height)
+
+
+def _render_embedded(page, info, area, fmt, opts, settings, timings):
+    """Build a page from its embedded full-page image instead of rasterising.
+
+    The image's own bytes are returned untouched when they are already in
+    the requested format at the requested size, and in a colorspace the
+    request accepts; encoder options such as ``quality`` are then ignored.
+    Otherwise the image is decoded (JPEGs at a reduced scale when shrinking)
+    and only resampled and re-encoded.  Under ``auto``, an image without
+    colour is checked for bilevel at its own resolution, and one that is
+    gets re-encoded at 1 bit rather than passed through.
+    """
+    native = "gray" if info["colorspace"] == 1 else "rgb"
+    mode   = "L" if native == "gray" else "RGB"
+    clock  = time.perf_counter()
+
+    img = Image.open(io.BytesIO(info["image"]))
+    img.draft(mode, (settings["thumb_width"], settings["thumb_width"]))
+    thumb_img = img.convert("RGB")
+    thumb_img = thumb_img.resize((settings["thumb_width"],
+                                  max(1, round(settings["thumb_width"] * info["height"] / info["width"]))),
+                                 Image.LANCZOS)
+    colorspace = opts["colorspace"]
+    if colorspace == "auto":
+        colorspace = "gray" if native == "gray" else _probe_colorspace(thumb_img)
+    thumb = _encode_image(thumb_img, "JPEG", {})
+    del img, thumb_img
+    timings["thumbnail"] = time.perf_counter() - clock
+
+    full = None
+    if opts["colorspace"] == "auto" and colorspace == "gray" and fmt in _BILEVEL_FORMATS:
+        clock = time.perf_counter()
+        full  = Image.open(io.BytesIO(info["image"])).convert("L")
+        if _probe_bilevel(full):
+            colorspace = "bilevel"
+        timings["probe"] = time.perf_counter() - clock
+
+    same_size = _embedded_size_matches(info, area)
+    clock     = time.perf_counter()
+    if (same_size and _EMBEDDED_FORMATS[info["ext"]] == fmt and colorspace != "bilevel"
+            and (colorspace == native or colorspace == "rgb" or opts["colorspace"] == "auto")):
+        data, width, height, colorspace = info["image"], info["width"], info["height"], native
+        timings["passthrough"] = time.perf_counter() - clock
+    else:
+        # The bilevel probe has already decoded the image at full size.
+        img = full if full is not None else Image.open(io.BytesIO(info["image"]))
+        if not same_size and full is None:
+            img.draft(mode, (area.width, area.height))
+        img = img.convert("L" if colorspace in ("gray", "bilevel") else "RGB")
+        if not same_size:
+            img = img.resize((area.width, area.height), Image.LANCZOS)
+        timings["resample"] = time.perf_counter() - clock
+        clock = time.perf_counter()
+        threshold = opts["threshold"] if colorspace == "bilevel" else None
+        data, (width, height) = _encode_image(img, fmt, opts, threshold), img.size
+        timings["encode"] = time.perf_counter() - clock
+        del img, full
+
+    return {
+        "page":       page.number + 1,
+        "data":       data,
+        "format":     fmt,
+        "colorspace": colorspace,
+        "width":      width,
+        "height":     height,
+        "thumb":      thumb,
+    }, timings
+
+
+def render_page(page, dpi, fmt, opts, settings):
+    """Render one page; returns ``(page_dict, stage_timings)``.
+
+    ``opts`` are the render options from ``render_options``.  Pages that
+    are a single full-page image (scans) are built from that image instead;
+    see ``_render_embedded``.  Otherwise the thumbnail is rendered first, as
+    it doubles as the ``auto`` colorspace's colour probe; a page without
+    colour is then rasterised gray and checked for bilevel at full size.  Timings are measured here, in whichever process
+    renders, and recorded by the caller back in the request's process.
+    """
+    mat     = fitz.Matrix(dpi / 72, dpi / 72)
+    area    = (page.rect * mat).irect
+    timings = {}
+
+    if opts["colorspace"] != "alpha":
+        clock = time.perf_counter()
+        info  = _full_page_image(page)
+        timings["extract"] = time.perf_counter() - clock
+        # Decoding is bounded like rasterising: pages too big to hold whole
+        # go the banded route unless their bytes can be passed through.
+        if info is not None and (area.width * area.height * 3 <= settings["band_threshold"]
+                                 or (_EMBEDDED_FORMATS[info["ext"]] == fmt
+                                     and _embedded_size_matches(info, area))):
+            return _render_embedded(page, info, area, fmt, opts, settings, timings)
+
+    clock      = time.perf_counter()
+    thumb_pix  = _render_thumbnail(page, settings["thumb_width"])
+    colorspace = opts["colorspace"]
+    if colorspace == "auto":
+        colorspace = _probe_colorspace(_pixmap_image(thumb_pix))
+    thumb = _encode_pixmap(thumb_pix, "JPEG", {})
+    del thumb_pix
+    timings["thumbnail"] = time.perf_counter() - clock
+
+    pix = None
+    if opts["colorspace"] == "auto" and colorspace == "gray" and fmt in _BILEVEL_FORMATS:
+        # The probe is the gray pixmap the page is then encoded from, unless
+        # the page is banded; it is then probed at the largest size that fits.
+        clock     = time.perf_counter()
+        probe_mat = mat
+        if fmt == "PNG" and area.width * area.height > settings["band_threshold"]:
+            scale     = (settings["band_threshold"] / (area.width * area.height)) ** 0.5
+            probe_mat = fitz.Matrix(mat.a * scale, mat.d * scale)
+        pix = page.get_pixmap(matrix=probe_mat, **_pixmap_args("gray"))
+        if _probe_bilevel(_pixmap_image(pix)):
+            colorspace = "bilevel"
+        if probe_mat is not mat:
+            pix = None
+        timings["probe"] = time.perf_counter() - clock
+
+    threshold = opts["threshold"] if colorspace == "bilevel" else None
+    samples   = COLORSPACES[colorspace][2]
+    clock     = time.perf_counter()
+
+    if fmt == "PNG" and area.width * area.height * samples > settings["band_threshold"]:
+        data, width, height = _render_banded_png(page, mat, settings["band_height"],
+                                                 opts.get("compress_level", _PNG_DEFAULT_LEVEL),
+                                                 colorspace, threshold)
+        timings["render_banded"] = time.perf_counter() - clock
+    else:
+        if pix is None:
+            pix = page.get_pixmap(matrix=mat, **_pixmap_args(colorspace))
+            timings["rasterize"] = time.perf_counter() - clock
+        clock = time.perf_counter()
+        data, width, height = _encode_pixmap(pix, fmt, opts, threshold), pix.width, pix.height
+        timings["encode"] = time.perf_counter() - clock
+        del pix
+
+    return {
+        "page":       page.number + 1,
+        "data":       data,
+        "format":     fmt,
+        "colorspace": colorspace,
+        "width":      width,
+        "height":     height,
+        "thumb":      thumb,
+    }, timings
+
+
+def _open_pdf(source):
+    """Open a PDF given as in-memory bytes or as a path on disk."""
+    if isinstance(source, bytes):
+        return fitz.open(stream=source, filetype="pdf")
+    return fitz.open(source)
+
+
+def render_slice(source, digest, page_indices, dpi, fmt, opts, settings):
+    """Pool worker: render a slice of pages from the worker's own document handle."""
+    clock = time.perf_counter()
+    with document_cache.open(source, digest) as pdf_doc:
+        opened   = time.perf_counter() - clock
+        rendered = [(i, *render_page(pdf_doc[i], dpi, fmt, opts, settings)) for i in page_indices]
+    rendered[0][2]["open"] = opened
+    return rendered
+
+
+# ── Document cache ───────────────────────────────────────────────────────────
+
+class DocumentCache:
+    """LRU cache of open ``fitz.Document`` handles, keyed by PDF SHA-256.
+
+    A handle is only ever used by one thread: ``open()`` checks an idle one
+    out of the cache, parsing the PDF when there is none, and checks it back
+    in when the block ends.  Concurrent renders of one document therefore
+    each get their own handle; only one per document is kept.  The cache is
+    bounded by the sizes of the PDFs held open, and evicted handles are
+    closed.  Each process has its own: a forked render worker starts empty
+    rather than sharing its parent's open files.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._docs     = OrderedDict()  # digest -> (document, size)
+        self._lock     = threading.Lock()
+        self._bytes    = 0
+        self.hits = self.misses = self.evictions = 0
+
+    @contextmanager
+    def open(self, source, digest):
+        """Yield an open document for ``source``, whose SHA-256 is ``digest``."""
+        with self._lock:
+            entry = self._docs.pop(digest, None)
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits   += 1
+                self._bytes -= entry[1]
+        if entry is None:
+            entry = (_open_pdf(source), _source_size(source))
+        try:
+            yield entry[0]
+        finally:
+            self._check_in(digest, entry)
+
+    def _check_in(self, digest, entry):
+        closing = []
+        with self._lock:
+            if digest in self._docs or entry[1] > self.max_bytes:
+                closing.append(entry[0])
+            else:
+                self._docs[digest] = entry
+                self._bytes       += entry[1]
+                while self._bytes > self.max_bytes:
+                    _, (old, size) = self._docs.popitem(last=False)
+                    self._bytes -= size
+                    self.evictions += 1
+                    closing.append(old)
+        for pdf_doc in closing:
+            pdf_doc.close()
+
+    def _forget(self):
+        # Called in forked children: the handles belong to the parent.
+        self._lock  = threading.Lock()
+        self._docs  = OrderedDict()
+        self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries":   len(self._docs),
+                "bytes":     self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits":      self.hits,
+                "misses":    self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+
+def _source_size(source):
+    return len(source) if isinstance(source, bytes) else os.path.getsize(source)
+
+
+# Disabled until sized by the embedding app (see DOCUMENT_CACHE_BYTES in index.py).
+document_cache = DocumentCache(0)
+os.register_at_fork(after_in_child=document_cache._forget)
+
+
+def init_worker(document_cache_bytes):
+    """Process pool initializer: size the worker's own document cache."""
+    document_cache.max_bytes = document_cache_bytes
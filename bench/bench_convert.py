@@ -0,0 +1,195 @@
+"""End-to-end conversion benchmark over synthetic documents.
+
+Drives ``POST /convert/stream`` through Flask's test client for every
+combination of document kind, page count, DPI and format, and reports
+pages/sec, p50/p95 per-page render time, peak RSS of the server process
+plus its render workers, and bytes produced.  Render time is the sum of the
+stage timings each page comes back with (extract, rasterise, encode,
+thumbnail, ...), wherever it rendered; gaps between page events would
+measure slice bursts instead, as the pool returns a slice at a time.  Each
+case starts with an empty session store and a fresh, already started
+render pool, and the server's peak RSS is reset where Linux allows it
+(``clear_refs``), so the peak is that case's own rather than the largest
+seen so far.  The render cache is disabled so every run renders, and
+so is the rate limit.
+
+    python bench/bench_convert.py --kinds text,scan --pages 1,20 --dpi 150,300 \\
+        --out bench/results.json --baseline bench/previous.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import resource
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "api"))
+os.environ.setdefault("RENDER_CACHE_BYTES", "0")
+os.environ.setdefault("RATE_LIMIT_PER_MINUTE", "0")
+
+import fitz  # noqa: E402
+
+import index  # noqa: E402
+from synthetic import KINDS, make_document  # noqa: E402
+
+
+# Stage timings of every page rendered, appended as the app consumes them.
+_page_timings = []
+_render_pages = index._render_pages
+
+
+def _recording_render_pages(*args):
+    for rendered in _render_pages(*args):
+        _page_timings.append(rendered[3])
+        yield rendered
+
+
+index._render_pages = _recording_render_pages
+
+
+def _peak_rss_kb(pid="self"):
+    """High-water RSS of a process in KiB, from /proc where available."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    if pid == "self":
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return 0
+
+
+def _processes():
+    pool = index._render_pool
+    return ["self"] + (list(pool._processes) if pool is not None else [])
+
+
+def start_case():
+    """Start a case afresh: no stored sessions, new render workers, peak RSS restarted.
+
+    Workers keep the heap an earlier case grew, so they are replaced rather
+    than reset.  Workers start on demand, so one task per worker brings the
+    whole new pool up here, where its start-up is not timed.
+    """
+    index.converted_sessions = index._make_session_store()
+    pool = index._render_pool
+    if pool is not None:
+        index._discard_render_pool(pool)
+    workers = index.app.config["RENDER_WORKERS"]
+    if workers > 1:
+        pool = index._get_render_pool()
+        for future in [pool.submit(time.sleep, 0.1) for _ in range(workers)]:
+            future.result()
+    for pid in _processes():
+        try:
+            with open(f"/proc/{pid}/clear_refs", "w") as f:
+                f.write("5")
+        except OSError:
+            pass
+
+
+def peak_rss_mb():
+    return sum(_peak_rss_kb(pid) for pid in _processes()) / 1024
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def run_case(client, pdf, dpi, fmt):
+    start    = time.perf_counter()
+    response = client.post(
+        "/convert/stream",
+        data={"pdf": (io.BytesIO(pdf), "bench.pdf"), "dpi": str(dpi), "format": fmt},
+        content_type="multipart/form-data",
+        buffered=False,
+    )
+    del _page_timings[:]
+    pages, page_bytes, body_bytes = 0, 0, 0
+    for line in response.response:
+        body_bytes += len(line)
+        event = json.loads(line)
+        if event["event"] == "error":
+            raise RuntimeError(event["error"])
+        if event["event"] == "page":
+            pages      += 1
+            page_bytes += event["bytes"]
+    elapsed = time.perf_counter() - start
+    # Opening the document is per slice, not per page.
+    render  = [sum(t for stage, t in timings.items() if stage != "open") for timings in _page_timings]
+
+    return {
+        "pages":          pages,
+        "seconds":        round(elapsed, 4),
+        "pages_per_sec":  round(pages / elapsed, 2),
+        "page_p50_ms":    round(percentile(render, 0.50) * 1000, 1),
+        "page_p95_ms":    round(percentile(render, 0.95) * 1000, 1),
+        "response_bytes": body_bytes,
+        "image_bytes":    page_bytes,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--kinds", default=",".join(KINDS))
+    parser.add_argument("--pages", default="1,10")
+    parser.add_argument("--dpi", default="72,150,300")
+    parser.add_argument("--formats", default="PNG,JPEG")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per case; the fastest is kept")
+    parser.add_argument("--out", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="earlier --out file to compare pages/sec against")
+    args = parser.parse_args()
+
+    client = index.app.test_client()
+    cases  = []
+
+    header = f"{'kind':<7} {'pages':>5} {'dpi':>4} {'fmt':<5} {'pg/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'RSS MB':>7} {'MB out':>7}"
+    print(header)
+    print("-" * len(header))
+
+    for kind in args.kinds.split(","):
+        for pages in map(int, args.pages.split(",")):
+            pdf = make_document(kind, pages)
+            for dpi in map(int, args.dpi.split(",")):
+                for fmt in args.formats.upper().split(","):
+                    start_case()
+                    runs   = [run_case(client, pdf, dpi, fmt) for _ in range(args.repeat)]
+                    result = max(runs, key=lambda r: r["pages_per_sec"])
+                    result.update(kind=kind, dpi=dpi, format=fmt, pdf_bytes=len(pdf),
+                                  peak_rss_mb=round(peak_rss_mb(), 1))
+                    cases.append(result)
+                    print(f"{kind:<7} {pages:>5} {dpi:>4} {fmt:<5} {result['pages_per_sec']:>7.2f} "
+                          f"{result['page_p50_ms']:>8.1f} {result['page_p95_ms']:>8.1f} "
+                          f"{result['peak_rss_mb']:>7.1f} {result['image_bytes'] / 1e6:>7.2f}")
+
+    report = {
+        "timestamp":      time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python":         platform.python_version(),
+        "pymupdf":        fitz.VersionBind,
+        "render_workers": index.app.config["RENDER_WORKERS"],
+        "cases":          cases,
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            before = {(c["kind"], c["pages"], c["dpi"], c["format"]): c for c in json.load(f)["cases"]}
+        print("\nvs. baseline (pages/sec)")
+        for c in cases:
+            old = before.get((c["kind"], c["pages"], c["dpi"], c["format"]))
+            if old:
+                ratio = c["pages_per_sec"] / old["pages_per_sec"] if old["pages_per_sec"] else float("inf")
+                print(f"{c['kind']:<7} {c['pages']:>5} {c['dpi']:>4} {c['format']:<5} "
+                      f"{old['pages_per_sec']:>7.2f} -> {c['pages_per_sec']:>7.2f}  ({ratio:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Per-page encode benchmark: PPM -> Pillow round trip vs. direct pixmap encode.
+
+Renders a synthetic page once per iteration and times only the encode step,
+comparing the original pipeline (``pix.tobytes("ppm")`` re-parsed by Pillow)
+with ``_encode_pixmap`` from ``api/pdfrender.py``.  "Copied" counts the bytes of
+every full-frame intermediate each path materialises, plus the encoded
+output.  Pillow holds RGB frames at 4 bytes per pixel, and only gray
+samples can be used in place.
+
+    python bench/bench_encode.py --dpi 300 --iterations 5
+"""
+import argparse
+import io
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+
+import fitz  # noqa: E402
+from PIL import Image  # noqa: E402
+
+from pdfrender import _encode_pixmap  # noqa: E402
+
+
+def sample_page():
+    doc  = fitz.open()
+    page = doc.new_page(width=595, height=842)  # A4
+    for row in range(40):
+        page.insert_text((48, 60 + row * 18), f"Line {row:02d} " + "lorem ipsum dolor sit amet " * 3, fontsize=9)
+    for k in range(12):
+        page.draw_circle((120 + k * 30, 700), 40, color=(k / 12, 0.2, 0.6), fill=(0.9, k / 12, 0.3))
+    return doc
+
+
+def encode_ppm_roundtrip(pix, fmt):
+    ppm = pix.tobytes("ppm")
+    img = Image.open(io.BytesIO(ppm))
+    img.load()
+    buf = io.BytesIO()
+    img.save(buf, format=fmt)
+    out = buf.getvalue()
+    frame = img.width * img.height * (1 if img.mode == "L" else 4)
+    return out, len(ppm) + frame + len(out)
+
+
+def encode_direct(pix, fmt):
+    out = _encode_pixmap(pix, fmt, {})
+    # PyMuPDF writes default-level PNG itself; Pillow copies non-gray samples.
+    frame = 0 if fmt == "PNG" or pix.n == 1 else pix.width * pix.height * 4
+    return out, frame + len(out)
+
+
+def run(fmt, dpi, iterations):
+    doc = sample_page()
+    mat = fitz.Matrix(dpi / 72, dpi / 72)
+    results = {}
+    for name, encode in (("before", encode_ppm_roundtrip), ("after", encode_direct)):
+        times, copied, size = [], 0, 0
+        for _ in range(iterations):
+            pix = doc[0].get_pixmap(matrix=mat)
+            start = time.perf_counter()
+            out, copied = encode(pix, fmt)
+            times.append(time.perf_counter() - start)
+            size = len(out)
+        results[name] = {"ms": statistics.median(times) * 1000, "copied": copied, "size": size}
+    doc.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dpi", type=int, default=200)
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--formats", default="PNG,JPEG")
+    args = parser.parse_args()
+
+    print(f"{'format':<6} {'path':<7} {'ms/page':>9} {'copied MB':>10} {'output KB':>10}")
+    for fmt in args.formats.upper().split(","):
+        for name, r in run(fmt, args.dpi, args.iterations).items():
+            print(f"{fmt:<6} {name:<7} {r['ms']:>9.1f} {r['copied'] / 1e6:>10.2f} {r['size'] / 1e3:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
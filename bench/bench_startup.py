@@ -0,0 +1,79 @@
+"""Cold-start benchmark: app import time and the latency of its first requests.
+
+Each run starts a fresh interpreter that imports ``api/index.py`` and then,
+through Flask's test client, requests ``GET /`` and converts a one-page
+synthetic PDF with ``POST /convert`` twice -- the first conversion pays for
+loading the renderer, the second shows the warm cost.  Medians over the
+runs are reported, together with the heavy modules already loaded after the
+import, which should be none.
+
+    python bench/bench_startup.py --runs 10 --kind text
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Run in the child interpreter; the PDF path arrives as argv[1].
+CHILD = r"""
+import io, json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, API)
+import index
+timings = {"import": time.perf_counter() - start}
+loaded  = [m for m in ("fitz", "PIL", "multiprocessing", "pdfrender") if m in sys.modules]
+
+client = index.app.test_client()
+clock  = time.perf_counter()
+assert client.get("/").status_code == 200
+timings["first GET /"] = time.perf_counter() - clock
+
+with open(sys.argv[1], "rb") as f:
+    pdf = f.read()
+for label in ("first POST /convert", "second POST /convert"):
+    clock    = time.perf_counter()
+    response = client.post("/convert", data={"pdf": (io.BytesIO(pdf), "bench.pdf"), "dpi": "150"},
+                           content_type="multipart/form-data")
+    assert response.status_code == 200, response.data
+    timings[label] = time.perf_counter() - clock
+
+print(json.dumps({"timings": timings, "loaded": loaded}))
+"""
+
+
+def run_child(pdf_path):
+    env = dict(os.environ, RENDER_CACHE_BYTES="0", RATE_LIMIT_PER_MINUTE="0")
+    code = f"API = {os.path.join(HERE, '..', 'api')!r}\n" + CHILD
+    out  = subprocess.run([sys.executable, "-c", code, pdf_path], env=env,
+                          check=True, capture_output=True, text=True).stdout
+    return json.loads(out.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--kind", default="text", help="synthetic document kind to convert")
+    args = parser.parse_args()
+
+    sys.path.insert(0, HERE)
+    from synthetic import make_document
+
+    with tempfile.NamedTemporaryFile(suffix=".pdf") as f:
+        f.write(make_document(args.kind, 1))
+        f.flush()
+        runs = [run_child(f.name) for _ in range(args.runs)]
+
+    print(f"{'stage':<22} {'median ms':>10} {'max ms':>8}")
+    for stage in runs[0]["timings"]:
+        values = [r["timings"][stage] * 1000 for r in runs]
+        print(f"{stage:<22} {statistics.median(values):>10.1f} {max(values):>8.1f}")
+    print(f"\nloaded after import: {', '.join(runs[0]['loaded']) or 'nothing heavy'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Synthetic PDFs for the benchmarks, generated locally with PyMuPDF.
+
+Each kind stresses a different part of the pipeline:
+
+    text    dense paragraphs of running text (font rasterisation)
+    vector  thousands of strokes and filled curves per page (path filling)
+    scan    one full-page JPEG per page, like scanner output (image decode)
+    large   A0 sheets mixing linework and labels (pixmap size)
+"""
+import io
+import random
+
+import fitz  # PyMuPDF
+from PIL import Image, ImageDraw, ImageFilter
+
+A4 = (595, 842)
+A0 = (2384, 3370)
+
+LOREM = (
+    "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor "
+    "incididunt ut labore et dolore magna aliqua. Ut enim ad minim veniam, quis nostrud "
+    "exercitation ullamco laboris nisi ut aliquip ex ea commodo consequat. "
+)
+
+
+def _text_page(doc, rng, n):
+    page = doc.new_page(width=A4[0], height=A4[1])
+    page.insert_text((48, 40), f"Section {n + 1}", fontsize=16)
+    page.insert_textbox(fitz.Rect(48, 60, A4[0] - 48, A4[1] - 40), LOREM * 14, fontsize=8.5)
+
+
+def _vector_page(doc, rng, n, size=A4, shapes=1500):
+    page  = doc.new_page(width=size[0], height=size[1])
+    shape = page.new_shape()
+    for _ in range(shapes):
+        x, y = rng.uniform(0, size[0]), rng.uniform(0, size[1])
+        if rng.random() < 0.5:
+            shape.draw_line((x, y), (x + rng.uniform(-80, 80), y + rng.uniform(-80, 80)))
+            shape.finish(color=(rng.random(), rng.random(), rng.random()), width=rng.uniform(0.2, 2))
+        else:
+            shape.draw_bezier((x, y), (x + 30, y - 40), (x + 60, y + 40), (x + 90, y))
+            shape.finish(color=(0, 0, 0), fill=(rng.random(), rng.random(), rng.random()), width=0.3)
+    shape.commit()
+    return page
+
+
+def _scan_jpeg(rng, width=1240, height=1754):
+    """A grey page of noisy 'text lines', roughly what a 150 DPI scanner emits."""
+    img  = Image.new("L", (width, height), 235)
+    draw = ImageDraw.Draw(img)
+    for y in range(120, height - 120, 34):
+        x = 100
+        while x < width - 140:
+            w = rng.randint(20, 90)
+            draw.rectangle((x, y, x + w, y + 14), fill=rng.randint(20, 70))
+            x += w + rng.randint(8, 18)
+    img = img.filter(ImageFilter.GaussianBlur(0.8)).convert("RGB")
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=80)
+    return buf.getvalue()
+
+
+def _scan_page(doc, rng, n):
+    page = doc.new_page(width=A4[0], height=A4[1])
+    page.insert_image(page.rect, stream=_scan_jpeg(rng))
+
+
+def _large_page(doc, rng, n):
+    page = _vector_page(doc, rng, n, size=A0, shapes=4000)
+    for k in range(60):
+        page.insert_text((rng.uniform(40, A0[0] - 200), rng.uniform(40, A0[1] - 40)),
+                         f"DETAIL {n + 1}.{k:02d}", fontsize=rng.choice((8, 12, 24)))
+
+
+KINDS = {
+    "text":   _text_page,
+    "vector": _vector_page,
+    "scan":   _scan_page,
+    "large":  _large_page,
+}
+
+
+def make_document(kind, pages, seed=0):
+    """Return the bytes of a ``pages``-page synthetic PDF of the given kind."""
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for n in range(pages):
+        KINDS[kind](doc, rng, n)
+    data = doc.tobytes(garbage=3, deflate=True)
+    doc.close()
+    return data
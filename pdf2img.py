@@ -0,0 +1,137 @@
+"""Convert PDFs to images from the command line, without the web app.
+
+    python pdf2img.py scans/ reports/q3.pdf -o out/ --format JPEG --dpi 150 --workers 4
+
+Each PDF gets a folder under the output directory, named after it, holding
+``page_001.jpeg``, ``page_002.jpeg``, ...  PDFs found in a directory (and
+its subdirectories with ``-r``) keep their relative paths.  Pages whose image
+already exists are skipped, so an interrupted run picks up where it stopped;
+``--force`` renders them again.  Pages are rendered in slices on a pool of
+worker processes, one per CPU by default, and written straight to disk.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "api"))
+
+import pdfrender  # noqa: E402
+
+
+def find_pdfs(inputs, recursive):
+    """Yield ``(pdf_path, output_subdir)`` for every PDF named in or found under ``inputs``."""
+    for path in inputs:
+        if not os.path.isdir(path):
+            yield path, os.path.splitext(os.path.basename(path))[0]
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs[:] = sorted(d for d in dirs if recursive and not d.startswith("."))
+            for name in sorted(files):
+                if name.lower().endswith(".pdf") and not name.startswith("."):
+                    full = os.path.join(root, name)
+                    yield full, os.path.splitext(os.path.relpath(full, path))[0]
+
+
+def page_path(out_dir, number, fmt):
+    return os.path.join(out_dir, f"page_{number:03d}.{fmt.lower()}")
+
+
+def convert_slice(pdf, out_dir, numbers, fmt, dpi, options):
+    """Worker: render pages ``numbers`` of ``pdf`` into ``out_dir``; returns bytes written.
+
+    Each image is written under a temporary name and renamed into place, so
+    a page that exists is always complete.
+    """
+    written = 0
+    for page in pdfrender.convert(pdf, fmt, dpi, pages=numbers, **options):
+        path = page_path(out_dir, page["page"], fmt)
+        with open(path + ".part", "wb") as f:
+            f.write(page["data"])
+        os.replace(path + ".part", path)
+        written += len(page["data"])
+    return written
+
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, not {number}")
+    return number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("inputs", nargs="+", help="PDF files or directories of PDFs")
+    parser.add_argument("-o", "--output", required=True, help="directory to write images to")
+    parser.add_argument("-r", "--recursive", action="store_true", help="search directories recursively")
+    parser.add_argument("--format", default="PNG", type=str.upper, choices=sorted(pdfrender.FORMATS))
+    parser.add_argument("--dpi", type=int, default=200)
+    parser.add_argument("--pages", help='page selection such as "1-3,7,10-"; default all')
+    parser.add_argument("--colorspace", choices=sorted(pdfrender.COLORSPACES) + ["auto"])
+    parser.add_argument("--threshold", type=int, help="bilevel cut-off, 0-255")
+    parser.add_argument("--quality", type=int, help="JPEG/WebP quality, 1-100")
+    parser.add_argument("--compress-level", type=int, help="PNG deflate level, 0-9")
+    parser.add_argument("--progressive", action="store_true", help="progressive JPEG")
+    parser.add_argument("--optimize", action="store_true", help="optimised JPEG Huffman tables")
+    parser.add_argument("--lossless", action="store_true", help="lossless WebP")
+    parser.add_argument("--workers", type=positive_int, default=os.cpu_count() or 1)
+    parser.add_argument("--force", action="store_true", help="render pages whose image already exists")
+    args = parser.parse_args()
+
+    options = {name: value for name, value in (
+        ("colorspace", args.colorspace), ("threshold", args.threshold), ("quality", args.quality),
+        ("compress_level", args.compress_level), ("progressive", args.progressive or None),
+        ("optimize", args.optimize or None), ("lossless", args.lossless or None),
+    ) if value is not None}
+
+    start   = time.perf_counter()
+    failed  = []
+    skipped = done = written = documents = 0
+
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        tasks = []
+        for pdf, subdir in find_pdfs(args.inputs, args.recursive):
+            out_dir = os.path.join(args.output, subdir)
+            try:
+                numbers = pdfrender.select_pages(pdf, args.pages)
+            except Exception as e:
+                failed.append(pdf)
+                print(f"{pdf}: {e}", file=sys.stderr)
+                continue
+            todo = [n for n in numbers
+                    if args.force or not os.path.exists(page_path(out_dir, n, args.format))]
+            skipped += len(numbers) - len(todo)
+            if not todo:
+                continue
+            os.makedirs(out_dir, exist_ok=True)
+            documents += 1
+            # A few slices per worker, so one large PDF still spreads out.
+            size = max(1, -(-len(todo) // (args.workers * 4)))
+            for k in range(0, len(todo), size):
+                numbers = todo[k:k + size]
+                future  = pool.submit(convert_slice, pdf, out_dir, numbers, args.format, args.dpi, options)
+                tasks.append((pdf, len(numbers), future))
+
+        for pdf, count, future in tasks:
+            try:
+                written += future.result()
+                done    += count
+            except Exception as e:
+                if pdf not in failed:
+                    failed.append(pdf)
+                    print(f"{pdf}: {e}", file=sys.stderr)
+
+    elapsed = time.perf_counter() - start
+    print(f"{done} pages from {documents} PDF(s) in {elapsed:.1f}s: "
+          f"{done / elapsed:.2f} pages/s, {written / 1e6:.1f} MB written ({written / 1e6 / elapsed:.2f} MB/s)")
+    if skipped:
+        print(f"{skipped} pages already converted, skipped")
+    if failed:
+        print(f"{len(failed)} PDF(s) failed", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())